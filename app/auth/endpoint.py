@@ -14,6 +14,7 @@ from starlette.responses import RedirectResponse
 
 from app.containers import Containers
 from app.core.cookies import cookie_auth
+from app.core.cookies.session_store import SessionStore
 from app.auth.services import AuthServices
 from app.core.viewmodels.loginviewmodel import LoginViewModel
 from app.user.schemas import(
@@ -25,7 +26,7 @@ auth = APIRouter(tags=["Authentification"])
 @auth.get("/acount/login")
 
 async def login_get(request:Request):
-    user_id = cookie_auth.get_user_id_via_cookie(request)
+    user_id = cookie_auth.get_user_id(request)
     if user_id:
         resp = fastapi.responses.RedirectResponse("/", status_code=302)
         return resp
@@ -35,4 +36,14 @@ async def login_get(request:Request):
     
 
 
+# deconnexion: le jeton est revoqué pour tous les workers (cookie ou bearer) et le cookie supprimé
 
+@auth.post("/acount/logout")
+@inject
+async def logout(
+    request:Request,
+    session_store:SessionStore = Depends(Provide[Containers.session_store])
+):
+    resp = fastapi.responses.RedirectResponse("/", status_code=status.HTTP_302_FOUND)
+    await cookie_auth.logout(resp, cookie_auth.get_session(request), session_store)
+    return resp
@@ -0,0 +1,299 @@
+# hashing module
+
+# bcrypt est volontairement lent (~200 ms), on ne doit jamais l'appeler dans la boucle d'evenements
+# les calculs sont envoyés dans un pool de processus borné et on attend le resultat de maniere asynchrone
+
+# passlib et multiprocessing sont importés a la premiere utilisation: l'import de l'application reste leger
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import time
+from typing import TYPE_CHECKING, Optional, Tuple
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+    from passlib.context import CryptContext
+
+
+_pwd_context: "Optional[CryptContext]" = None
+
+
+def _configure_context(rounds: Optional[int] = None) -> None:
+    from passlib.context import CryptContext
+
+    global _pwd_context
+    if rounds is None:
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    else:
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+
+
+def _get_context() -> "CryptContext":
+    if _pwd_context is None:
+        _configure_context()
+    return _pwd_context
+
+
+# ces fonctions tournent dans les processus du pool, elles renvoient aussi le moment de debut
+# et la durée du calcul pour mesurer l'attente dans la file et le temps de hash
+
+def _hash_in_worker(password: str) -> Tuple[str, float, float]:
+    started = time.monotonic()
+    hashed = _get_context().hash(password)
+    return hashed, started, time.monotonic() - started
+
+
+def _verify_in_worker(plain_password: str, hashed_password: str) -> Tuple[bool, float, float]:
+    started = time.monotonic()
+    valid = _get_context().verify(plain_password, hashed_password)
+    return valid, started, time.monotonic() - started
+
+
+# verify_and_update renvoie un nouveau hash quand le cout stocké ne correspond plus au cout calibré
+
+def _verify_and_update_in_worker(plain_password: str, hashed_password: str) -> Tuple[Tuple[bool, Optional[str]], float, float]:
+    started = time.monotonic()
+    valid, new_hash = _get_context().verify_and_update(plain_password, hashed_password)
+    return (valid, new_hash), started, time.monotonic() - started
+
+
+# on mesure le cout de bcrypt sur cette machine en montant les rounds un par un,
+# chaque round double le temps donc la calibration coute environ deux fois le budget
+
+def _calibrate_in_worker(latency_budget_ms: float, min_rounds: int, max_rounds: int) -> Tuple[int, float, float]:
+    from passlib.hash import bcrypt
+
+    started = time.monotonic()
+    chosen = min_rounds
+    for rounds in range(min_rounds, max_rounds + 1):
+        handler = bcrypt.using(rounds=rounds)
+        sample = handler.hash("calibration")
+        timings = []
+        for _ in range(3):
+            t0 = time.perf_counter()
+            handler.verify("calibration", sample)
+            timings.append(time.perf_counter() - t0)
+        if min(timings) * 1000 > latency_budget_ms:
+            break
+        chosen = rounds
+    return chosen, started, time.monotonic() - started
+
+
+# le cout calibré est enregistré dans un fichier: le maitre du lanceur calibre une seule fois avant le fork
+# et tous les workers (et l'import en masse) relisent la meme valeur. des couts differents entre workers
+# feraient rehasher le mot de passe a chaque connexion qui tombe sur un autre worker.
+# supprimer le fichier pour recalibrer (changement de machine)
+
+def read_calibration(path: str, latency_budget_ms: float, min_rounds: int, max_rounds: int) -> Optional[int]:
+    try:
+        with open(path, encoding="utf-8") as fh:
+            saved = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    if saved.get("latency_budget_ms") != latency_budget_ms or saved.get("min_rounds") != min_rounds \
+            or saved.get("max_rounds") != max_rounds:
+        return None
+    return int(saved["rounds"])
+
+
+def write_calibration(path: str, rounds: int, latency_budget_ms: float, min_rounds: int, max_rounds: int) -> None:
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump({
+            "rounds": rounds,
+            "latency_budget_ms": latency_budget_ms,
+            "min_rounds": min_rounds,
+            "max_rounds": max_rounds,
+        }, fh)
+    os.replace(tmp_path, path)
+
+
+def load_or_calibrate(path: Optional[str], latency_budget_ms: float, min_rounds: int, max_rounds: int) -> int:
+    rounds = read_calibration(path, latency_budget_ms, min_rounds, max_rounds) if path else None
+    if rounds is None:
+        rounds, _, _ = _calibrate_in_worker(latency_budget_ms, min_rounds, max_rounds)
+        if path:
+            write_calibration(path, rounds, latency_budget_ms, min_rounds, max_rounds)
+    return rounds
+
+
+class HashingError(Exception):
+    pass
+
+
+class HashingBusyError(HashingError):
+    pass
+
+
+class HashingTimeoutError(HashingError):
+    pass
+
+
+class HashingMetrics:
+    def __init__(self) -> None:
+        self.calls = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.hash_time_total = 0.0
+        self.hash_time_max = 0.0
+
+    def record(self, queue_wait: float, hash_time: float) -> None:
+        self.calls += 1
+        self.queue_wait_total += queue_wait
+        self.queue_wait_max = max(self.queue_wait_max, queue_wait)
+        self.hash_time_total += hash_time
+        self.hash_time_max = max(self.hash_time_max, hash_time)
+
+    def to_dict(self) -> dict:
+        calls = self.calls or 1
+        return {
+            "calls": self.calls,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "queue_wait_avg_ms": self.queue_wait_total / calls * 1000,
+            "queue_wait_max_ms": self.queue_wait_max * 1000,
+            "hash_time_avg_ms": self.hash_time_total / calls * 1000,
+            "hash_time_max_ms": self.hash_time_max * 1000,
+        }
+
+
+class PasswordHasher:
+    def __init__(
+        self,
+        pool_size: int = 2,
+        queue_depth: int = 64,
+        timeout: float = 5.0,
+        rounds: Optional[int] = None,
+        latency_budget_ms: Optional[float] = None,
+        min_rounds: int = 10,
+        max_rounds: int = 15,
+        calibration_path: Optional[str] = None
+    ) -> None:
+        self.pool_size = int(pool_size)
+        self.queue_depth = int(queue_depth)
+        self.timeout = float(timeout)
+        self.rounds: Optional[int] = int(rounds) if rounds else None
+        self.latency_budget_ms = float(latency_budget_ms) if latency_budget_ms else None
+        self.min_rounds = int(min_rounds)
+        self.max_rounds = int(max_rounds)
+        self.calibration_path = calibration_path
+        self.metrics = HashingMetrics()
+        self._pending = 0
+        self._executor: "Optional[ProcessPoolExecutor]" = None
+        self._calibration_lock = asyncio.Lock()
+        self._calibrated = self.rounds is not None or self.latency_budget_ms is None
+
+    def _get_executor(self) -> "ProcessPoolExecutor":
+        if self._executor is None:
+            from concurrent.futures import ProcessPoolExecutor
+
+            # pas de fork: le pool est créé alors que des threads tournent deja (aiosqlite, store de sessions)
+            methods = multiprocessing.get_all_start_methods()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.pool_size,
+                mp_context=multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn"),
+                initializer=_configure_context,
+                initargs=(self.rounds,)
+            )
+        return self._executor
+
+    # appelée au demarrage: reprend le cout enregistré, sinon choisit le cout bcrypt le plus haut
+    # qui tient dans le budget de latence et l'enregistre, puis recrée le pool avec ce cout
+
+    async def calibrate(self) -> Optional[int]:
+        async with self._calibration_lock:
+            if self._calibrated:
+                return self.rounds
+            rounds = None
+            if self.calibration_path:
+                rounds = read_calibration(self.calibration_path, self.latency_budget_ms, self.min_rounds, self.max_rounds)
+            if rounds is None:
+                future = asyncio.wrap_future(self._get_executor().submit(
+                    _calibrate_in_worker, self.latency_budget_ms, self.min_rounds, self.max_rounds
+                ))
+                rounds, _, _ = await future
+                if self.calibration_path:
+                    write_calibration(self.calibration_path, rounds, self.latency_budget_ms, self.min_rounds, self.max_rounds)
+            logging.getLogger(__name__).info(
+                "bcrypt cost set to %s rounds for a %s ms budget", rounds, self.latency_budget_ms
+            )
+            self.rounds = rounds
+            _configure_context(rounds)
+            old_executor, self._executor = self._executor, None
+            if old_executor is not None:
+                old_executor.shutdown(wait=False)
+            self._calibrated = True
+            return rounds
+
+    async def _submit(self, fn, *args):
+        # au dela de pool_size + queue_depth appels en attente on refuse plutot que d'empiler
+        if self._pending >= self.pool_size + self.queue_depth:
+            self.metrics.rejected += 1
+            raise HashingBusyError("password hashing queue is full")
+
+        # la place est reservée avant le premier await: les appels qui attendent la calibration comptent deja.
+        # si la calibration ou la soumission echoue elle est rendue tout de suite, sinon elle n'est rendue
+        # que lorsque le processus a vraiment fini le calcul, meme si l'appelant a abandonné (timeout, annulation)
+        self._pending += 1
+        try:
+            if not self._calibrated:
+                await self.calibrate()
+            submitted = time.monotonic()
+            concurrent_future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._pending -= 1
+            raise
+        future = asyncio.wrap_future(concurrent_future)
+        future.add_done_callback(self._release)
+        try:
+            result, started, hash_time = await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.metrics.timeouts += 1
+            concurrent_future.cancel()
+            raise HashingTimeoutError("password hashing timed out")
+        except asyncio.CancelledError:
+            concurrent_future.cancel()
+            raise
+
+        self.metrics.record(max(started - submitted, 0.0), hash_time)
+        return result
+
+    def _release(self, future: asyncio.Future) -> None:
+        self._pending -= 1
+        if not future.cancelled():
+            future.exception()
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(_hash_in_worker, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._submit(_verify_in_worker, plain_password, hashed_password)
+
+    async def verify_and_update(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        return await self._submit(_verify_and_update_in_worker, plain_password, hashed_password)
+
+    def needs_update(self, hashed_password: str) -> bool:
+        if _pwd_context is None:
+            _configure_context(self.rounds)
+        return _get_context().needs_update(hashed_password)
+
+    # demarre tous les processus du pool avant le trafic (un calcul par processus en parallele)
+
+    async def warm_up(self) -> None:
+        await self.calibrate()
+        sample = await self.hash("warm-up")
+        await asyncio.gather(*(self.verify("warm-up", sample) for _ in range(self.pool_size)))
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
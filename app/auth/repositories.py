@@ -7,79 +7,157 @@ import logging
 from contextlib import AbstractAsyncContextManager
 from typing import Callable, Optional
 
-from passlib.context import CryptContext
 from sqlalchemy.ext.asyncio import AsyncSession
-from fastapi.security import OAuth2AuthorizationCodeBearer
-from sqlalchemy.future import select
+from sqlalchemy import update
 
+from app.bd.hot_queries import hot_queries
+from app.bd.sharding import ShardedDatabase, allocate_id
+from app.auth.hashing import PasswordHasher
+from app.auth.singleflight import SingleFlight
 from app.user.schemas import (
     UserLogin,
     UserCreate
 )
 
+from app.user.cache import UserCache, UserSnapshot, normalize_email
+from app.user.loaders import UserLoader
 from app.user.models import User
-
-
-pwd_context = CryptContext(schemes=["Bcrypt"], deprecated="auto")
+from app.user.queries import USER_BY_EMAIL, USER_BY_ID
+from app.user.repositories import check_email_free
 
 
 # ce constructeur va nous permettre de se comminiquer avec notre base de donnée pour pour faire des requettes 
+# session_factory(shard) ouvre une session de lecture, database.write(shard, fn) envoie une fonction d'ecriture
+# a l'ecrivain unique du shard (voir app/bd/sharding.py pour le placement des utilisateurs)
+# le hash bcrypt passe par le PasswordHasher pour ne pas bloquer la boucle d'evenements
 
 class AuthRepositories:
-    def __init__(self, session_factory: Callable[..., AbstractAsyncContextManager[AsyncSession]]) -> None:
+    def __init__(
+        self,
+        session_factory: Callable[..., AbstractAsyncContextManager[AsyncSession]],
+        database: ShardedDatabase,
+        password_hasher: PasswordHasher,
+        login_flights: Optional[SingleFlight] = None,
+        user_loader: Optional[UserLoader] = None,
+        user_cache: Optional[UserCache] = None
+    ) -> None:
         self.session_factory = session_factory
-# user va nous communiquer un mot de passe en text claire qui sera stocker dans la base de donnée, par la suite on va 
-# hashe ce mot de passe  a travers la methode pwd_context
-
-def get_password_hash(self, password:str)->str:
-    return pwd_context.hash(password)
-
-def verify_password_hash(self, plain_password:str, hashed_password:str) -> bool:
-    return pwd_context.verify(plain_password,hashed_password)
-
+        self.database = database
+        self.password_hasher = password_hasher
+        self.login_flights = login_flights
+        self.user_loader = user_loader
+        self.user_cache = user_cache
 
-async def get_user_by_email(self, email: str) -> Optional[User]:
-    async with self.session_factory() as session:
-        query = select(User).filter(User.email== email)
-        result = await session.execute(query)
-        user= result.scalar_one_or_none()
-    
-    if user is None:
+# user va nous communiquer un mot de passe en text claire qui sera stocker dans la base de donnée, par la suite on va 
+# hashe ce mot de passe  a travers le pool de hash
+
+    async def get_password_hash(self, password:str)->str:
+        return await self.password_hasher.hash(password)
+
+    async def verify_password_hash(self, plain_password:str, hashed_password:str) -> bool:
+        return await self.password_hasher.verify(plain_password,hashed_password)
+
+
+# les recherches regardent d'abord le cache d'utilisateurs, puis passent par le loader
+# qui regroupe les emails demandés pendant le meme tour de boucle
+
+    async def get_user_by_email(self, email: str) -> Optional[UserSnapshot]:
+        generation = None
+        if self.user_cache is not None:
+            snapshot = self.user_cache.get_by_email(email)
+            if snapshot is not None:
+                return snapshot
+            generation = self.user_cache.generation
+        if self.user_loader is not None:
+            user = await self.user_loader.load_by_email(email)
+        else:
+            user = await self._find_by_email(normalize_email(email))
+        if user is None:
             return None
-    return user
-
-async def login_user(self, user_login: UserLogin) ->Optional[User]:
-    user = await self.get_user_by_email(user_login.email)
-    if  not get_user_by_email(user_login.email):
-        None
-    if verify_password_hash(user_login.password):
-        None
-    return user
-        
-        
-        
-        
-        
-        
-        
-        
-        
-        
-    
-    # if user is None:
-    #     return None
-    # if not self.verify_password_hash(user_login.password, User.hash_password):
-    #     return None
-    # return user
-
-
-        
-
-
-
-
-
-
-
-
-
+        return self._remember(user, generation)
+
+    async def get_user_by_id(self, user_id: int) -> Optional[UserSnapshot]:
+        generation = None
+        if self.user_cache is not None:
+            snapshot = self.user_cache.get_by_id(user_id)
+            if snapshot is not None:
+                return snapshot
+            generation = self.user_cache.generation
+        if self.user_loader is not None:
+            user = await self.user_loader.load_by_id(user_id)
+        else:
+            async with self.session_factory(self.database.shard_for_id(user_id)) as session:
+                user = await hot_queries.one_or_none(session, USER_BY_ID, user_id=user_id)
+        if user is None:
+            return None
+        return self._remember(user, generation)
+
+    # sans loader: le shard de l'email d'abord, puis les autres
+
+    async def _find_by_email(self, email: str) -> Optional[UserSnapshot]:
+        home = self.database.shard_for_email(email)
+        for shard in [home] + [other for other in range(self.database.shard_count) if other != home]:
+            async with self.session_factory(shard) as session:
+                user = await hot_queries.one_or_none(session, USER_BY_EMAIL, email=email)
+            if user is not None:
+                return user
+        return None
+
+    def _remember(self, snapshot: UserSnapshot, generation: Optional[int] = None) -> UserSnapshot:
+        if self.user_cache is not None:
+            self.user_cache.put(snapshot, generation)
+        return snapshot
+
+    async def create_user(self, user_create: UserCreate) -> User:
+        hash_password = await self.get_password_hash(user_create.password)
+        user = User(
+            email=normalize_email(user_create.email),
+            name=user_create.name or "",
+            hash_password=hash_password
+        )
+
+        # le shard est choisi par l'email, l'id alloué pour que le routage par id retombe sur ce shard
+        shard = self.database.shard_for_email(user.email)
+        await check_email_free(self.database, user.email, shard, self.user_loader)
+
+        async def insert(session: AsyncSession) -> User:
+            if self.database.shard_count > 1:
+                user.id = await allocate_id(session, User.id, shard, self.database.shard_count)
+            session.add(user)
+            await session.flush()
+            return user
+
+        await self.database.write(shard, insert)
+        if self.user_cache is not None:
+            self.user_cache.invalidate(email=user.email)
+        return user
+
+# les tentatives identiques simultanées (meme email, meme mot de passe) partagent une seule verification
+# la clé reprend l'email tel qu'il a été saisi: seules des requetes strictement identiques sont regroupées
+
+    async def login_user(self, user_login: UserLogin) ->Optional[UserSnapshot]:
+        if self.login_flights is None:
+            return await self._login_user(user_login)
+        key = self.login_flights.digest(user_login.email, user_login.password)
+        return await self.login_flights.do(key, lambda: self._login_user(user_login))
+
+    async def _login_user(self, user_login: UserLogin) ->Optional[UserSnapshot]:
+        user = await self.get_user_by_email(user_login.email)
+        if user is None:
+            return None
+        valid, new_hash = await self.password_hasher.verify_and_update(user_login.password, user.hash_password)
+        if not valid:
+            return None
+        if new_hash is not None:
+            await self.update_password_hash(user.id, new_hash)
+            user.hash_password = new_hash
+        return user
+
+# quand le cout bcrypt calibré change, on remplace le hash stocké au moment ou on connait le mot de passe
+
+    async def update_password_hash(self, user_id: int, hash_password: str) -> None:
+        await self.database.write(self.database.shard_for_id(user_id), lambda session: session.execute(
+            update(User).where(User.id == user_id).values(hash_password=hash_password)
+        ))
+        if self.user_cache is not None:
+            self.user_cache.invalidate(user_id=user_id)
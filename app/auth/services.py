@@ -1,16 +1,23 @@
 # service auth module 
 
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
-from app.user.models import User
-from .repositories import AuthRepositories
+from app.user.cache import UserSnapshot
 from app.user.schemas import(
-    UserLogin
+    UserLogin,
+    UserCreate
 )
 
+if TYPE_CHECKING:
+    from app.user.models import User
+    from .repositories import AuthRepositories
+
 class AuthServices:
-    def __init__(self, auth_repository: AuthRepositories) -> None:
-        self.auth_repository: AuthRepositories = auth_repository
+    def __init__(self, auth_repository: "AuthRepositories") -> None:
+        self.auth_repository: "AuthRepositories" = auth_repository
         
-        async def login_user(self, user_login: UserLogin) ->Optional[User]:
-            user = await self.repository.login_user(user_login)
\ No newline at end of file
+    async def login_user(self, user_login: UserLogin) ->Optional[UserSnapshot]:
+        return await self.auth_repository.login_user(user_login)
+
+    async def create_user(self, user_create: UserCreate) -> "User":
+        return await self.auth_repository.create_user(user_create)
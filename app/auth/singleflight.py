@@ -0,0 +1,87 @@
+# single flight module
+
+# les clients mobiles renvoient la meme requete de connexion plusieurs fois en quelques millisecondes
+# les tentatives identiques en cours partagent le meme resultat au lieu de refaire la requete et le bcrypt
+
+import asyncio
+import hashlib
+import hmac
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class _Flight:
+    def __init__(self, future: asyncio.Future) -> None:
+        self.future = future
+        self.elapsed = 0.0
+
+
+def _consume_exception(future: asyncio.Future) -> None:
+    # evite le warning "exception was never retrieved" quand personne n'attendait le leader
+    if not future.cancelled():
+        future.exception()
+
+
+class SingleFlight:
+    def __init__(self, key: Optional[bytes] = None) -> None:
+        # la clé est propre au processus: le condensat ne permet pas de retrouver le mot de passe hors memoire
+        self._key = key or os.urandom(32)
+        self._flights: Dict[bytes, _Flight] = {}
+        self.leaders = 0
+        self.shared = 0
+        self.saved_seconds = 0.0
+
+    def digest(self, *parts: str) -> bytes:
+        message = b"\x00".join(part.encode("utf-8") for part in parts)
+        return hmac.new(self._key, message, hashlib.sha256).digest()
+
+    async def do(self, key: bytes, fn: Callable[[], Awaitable[Any]]) -> Any:
+        while True:
+            flight = self._flights.get(key)
+            if flight is None:
+                return await self._lead(key, fn)
+            self.shared += 1
+            try:
+                result = await asyncio.shield(flight.future)
+            except asyncio.CancelledError:
+                # le leader a été annulé (client deconnecté) mais pas nous: on recommence, en leader si besoin
+                task = asyncio.current_task()
+                if task is not None and task.cancelling():
+                    raise
+                continue
+            self.saved_seconds += flight.elapsed
+            return result
+
+    async def _lead(self, key: bytes, fn: Callable[[], Awaitable[Any]]) -> Any:
+        flight = _Flight(asyncio.get_running_loop().create_future())
+        flight.future.add_done_callback(_consume_exception)
+        self._flights[key] = flight
+        self.leaders += 1
+        started = time.perf_counter()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            flight.future.cancel()
+            raise
+        except BaseException as err:
+            flight.future.set_exception(err)
+            raise
+        else:
+            flight.future.set_result(result)
+            return result
+        finally:
+            flight.elapsed = time.perf_counter() - started
+            del self._flights[key]
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def to_dict(self) -> dict:
+        return {
+            "leaders": self.leaders,
+            "shared": self.shared,
+            "in_flight": self.in_flight,
+            "saved_seconds": self.saved_seconds,
+        }
@@ -1,64 +1,222 @@
-from typing import Callable
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional
 
-from fastapi import FastAPI
-from sqlalchemy import orm
-from sqlalchemy.orm import sessionmaker 
+from sqlalchemy import event, text
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
     create_async_engine,
+    async_sessionmaker,
     AsyncSession
 )
 
+from app.bd.instrumentation import QueryMonitor
+from app.bd.migrations import ensure_schema
+from app.bd.pragmas import apply_pragmas, pragma_statements, resolve_profile
+from app.bd.writer import SingleWriter, WriteFn
+
+logger = logging.getLogger(__name__)
 
 
 Base = declarative_base()                                    # declaration d'une base de données
 
+
+# statistiques du pool: connexions sorties, coroutines en attente d'une connexion et temps d'attente
+
+class PoolStats:
+    def __init__(self) -> None:
+        self.checkouts = 0
+        self.waiters = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def record_wait(self, elapsed: float) -> None:
+        self.checkouts += 1
+        self.wait_time_total += elapsed
+        self.wait_time_max = max(self.wait_time_max, elapsed)
+
+
 class Database:
-    def __init__(self, db_url) -> None:
-        print(f"db_url {db_url}")
-        
+    def __init__(
+        self,
+        db_url,
+        pool_size: int = 5,
+        max_overflow: int = 10,
+        pool_timeout: float = 30.0,
+        pool_recycle: int = -1,
+        performance_preset: Optional[str] = "balanced",
+        performance_overrides: Optional[dict] = None,
+        writer_queue_size: int = 0,
+        group_commit_max_batch_size: int = 64,
+        group_commit_max_delay_ms: float = 2.0,
+        slow_query_ms: float = 100.0,
+        monitor: Optional[QueryMonitor] = None
+    ) -> None:
+        logger.info("db_url %s", db_url)
+        self.pool_size = int(pool_size)
+        self.stats = PoolStats()
         
+        # pool de lecteurs: plusieurs connexions en lecture seule (PRAGMA query_only)
         self._engine : AsyncEngine = create_async_engine(
             url=db_url,
             echo= False,
-            connect_args= {"cheek_same_threed" :True}      # La non partage des donnée, partage des donnee pour eviter la corruption des données on mets "cheek_same_threed" :True
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=self.pool_size,
+            max_overflow=int(max_overflow),
+            pool_timeout=float(pool_timeout),
+            pool_recycle=int(pool_recycle),
+            connect_args= {"check_same_thread" :False}      # aiosqlite utilise son propre thread par connexion, le pool garantit qu'une connexion n'est utilisée que par une session a la fois
             
             )                                                  #creattion d'un moteur de connexion
-# on va créer les sessions avec parametre comme autocommit... et liée la session au engine        
-        self._session_factory= orm.scoped_session(
+
+        # un seul ecrivain: une connexion dediée, alimentée par la file du SingleWriter
+        self._write_engine : AsyncEngine = create_async_engine(
+            url=db_url,
+            echo= False,
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=1,
+            max_overflow=0,
+            pool_recycle=int(pool_recycle),
+            connect_args= {"check_same_thread" :False}
+            )
+
+# le profil de performance SQLite est appliqué sur chaque nouvelle connexion des deux pools
+        self.performance_profile = resolve_profile(performance_preset, performance_overrides)
+        statements = pragma_statements(self.performance_profile)
+        read_statements = statements + ["PRAGMA query_only=1"]
+        event.listen(
+            self._engine.sync_engine,
+            "connect",
+            lambda dbapi_connection, connection_record: apply_pragmas(dbapi_connection, read_statements)
+        )
+        event.listen(self._write_engine.sync_engine, "connect", self._on_writer_connect(statements))
+        # le pilote sqlite gere mal les SAVEPOINT du group commit: on ouvre la transaction nous meme,
+        # en IMMEDIATE pour prendre le verrou d'ecriture des le debut
+        event.listen(
+            self._write_engine.sync_engine,
+            "begin",
+            lambda conn: conn.exec_driver_sql("BEGIN IMMEDIATE")
+        )
+        # latence par requete, requetes lentes et N+1 (voir instrumentation.py), partagé entre shards (voir sharding.py)
+        self.monitor = monitor if monitor is not None else QueryMonitor(slow_query_ms=slow_query_ms)
+        self.monitor.attach(self._engine.sync_engine)
+        self.monitor.attach(self._write_engine.sync_engine)
+# on va créer les sessions liées au engine, sans autoflush et sans expirer les objets apres commit
+        self._session_factory= async_sessionmaker(
+            self._engine,
             class_ = AsyncSession,
-            autocommit= False,
             autoflush= False,
-            bind = self._engine
+            expire_on_commit= False
+        )
+        self._write_session_factory= async_sessionmaker(
+            self._write_engine,
+            class_ = AsyncSession,
+            autoflush= False,
+            expire_on_commit= False
+        )
+        self.writer = SingleWriter(
+            self._write_session_factory,
+            max_queue_size=writer_queue_size,
+            max_batch_size=group_commit_max_batch_size,
+            max_delay=float(group_commit_max_delay_ms) / 1000
         )
-        
-#  on va creer une base de donnee qui va rien retourner
 
-async def create_database(self) -> None:
-    async with self._engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-        
-aysc_session = sessionmaker(AsyncEngine)
-
-async def get_session():
-    session = aysc_session()
-    try:
-        yield session
-    except  Exception as err:
-        print(f"session rollback because of exception : {err}")
-        await session.rollback()
-        raise ("error")
-    finally:
-        session.close()
-        
-    
+    @staticmethod
+    def _on_writer_connect(statements):
+        def on_connect(dbapi_connection, connection_record) -> None:
+            apply_pragmas(dbapi_connection, statements)
+            dbapi_connection.isolation_level = None
+        return on_connect
 
-    
-    
-        
-        
-        
-        
-        
-        
\ No newline at end of file
+    @property
+    def engine(self) -> AsyncEngine:
+        return self._engine
+
+#  on cree ou met a jour le schema seulement si l'empreinte de Base.metadata a changé (voir migrations.py)
+#  renvoie True quand un travail de schema a été fait
+
+    async def create_database(self) -> bool:
+        return await ensure_schema(self._engine, self._write_engine, Base.metadata)
+
+# on ouvre toutes les connexions du pool au demarrage pour que leur cout ne tombe pas sur les premieres requetes
+
+    async def warm_up(self) -> None:
+        connections = []
+        try:
+            for _ in range(self.pool_size):
+                conn = await self._engine.connect()
+                connections.append(conn)
+                await conn.execute(text("SELECT 1"))
+        finally:
+            for conn in connections:
+                await conn.close()
+        self.writer.start()
+
+# les repositories choisissent selon l'intention: read_session pour lire, write(fn) pour ecrire
+# write(fn) met fn(session) dans la file de l'ecrivain et renvoie son resultat apres commit
+
+    async def write(self, fn: WriteFn) -> Any:
+        return await self.writer.submit(fn)
+
+# verification avant d'accepter du trafic: un lecteur et l'ecrivain repondent
+
+    async def ping(self) -> None:
+        async with self.read_session() as session:
+            await session.execute(text("SELECT 1"))
+        await self.write(lambda session: session.execute(text("SELECT 1")))
+
+# session dont la connexion est deja sortie du pool, attente comptée dans les stats: c'est a l'appelant de la fermer
+# (session partagée d'une requete, voir unit_of_work.py)
+
+    async def open_read_session(self) -> AsyncSession:
+        session = self._session_factory()
+        self.stats.waiters += 1
+        started = time.perf_counter()
+        try:
+            await session.connection()
+        except BaseException:
+            await session.close()
+            raise
+        finally:
+            self.stats.waiters -= 1
+        self.stats.record_wait(time.perf_counter() - started)
+        return session
+
+    @asynccontextmanager
+    async def read_session(self) -> AsyncIterator[AsyncSession]:
+        session = await self.open_read_session()
+        try:
+            yield session
+        except Exception as err:
+            logger.warning("session rollback because of exception : %s", err)
+            await session.rollback()
+            raise
+        finally:
+            await session.close()
+
+    session = read_session
+
+    def pool_status(self) -> dict:
+        pool = self._engine.pool
+        checkouts = self.stats.checkouts or 1
+        return {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "waiters": self.stats.waiters,
+            "checkouts": self.stats.checkouts,
+            "wait_avg_ms": self.stats.wait_time_total / checkouts * 1000,
+            "wait_max_ms": self.stats.wait_time_max * 1000,
+            "writer": self.writer.to_dict(),
+        }
+
+    async def dispose(self) -> None:
+        try:
+            await self.writer.stop()
+        finally:
+            await self._engine.dispose()
+            await self._write_engine.dispose()
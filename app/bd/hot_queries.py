@@ -0,0 +1,57 @@
+# hot queries registry
+
+# les requetes les plus frequentes sont construites une seule fois au demarrage (meme objet statement,
+# donc la forme compilée est reprise du cache de compilation de SQLAlchemy a chaque appel)
+# elles s'executent en Core: des tuples convertis en petits objets a slots, sans hydratation ORM
+
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Executable
+
+
+class HotQuery:
+    __slots__ = ("name", "statement", "row_factory")
+
+    def __init__(self, name: str, statement: Executable, row_factory: Optional[Callable[..., Any]] = None) -> None:
+        self.name = name
+        self.statement = statement
+        self.row_factory = row_factory
+
+
+class HotQueryRegistry:
+    def __init__(self) -> None:
+        self._queries: Dict[str, HotQuery] = {}
+
+    def register(self, name: str, statement: Executable, row_factory: Optional[Callable[..., Any]] = None) -> HotQuery:
+        if name in self._queries:
+            raise ValueError(f"hot query {name!r} is already registered")
+        query = HotQuery(name, statement, row_factory)
+        self._queries[name] = query
+        return query
+
+    def get(self, name: str) -> HotQuery:
+        return self._queries[name]
+
+    def names(self) -> List[str]:
+        return list(self._queries)
+
+    async def all(self, session: AsyncSession, name: str, **params: Any) -> List[Any]:
+        query = self._queries[name]
+        connection = await session.connection()
+        result = await connection.execute(query.statement, params)
+        if query.row_factory is None:
+            return list(result.all())
+        factory = query.row_factory
+        return [factory(*row) for row in result]
+
+    async def one_or_none(self, session: AsyncSession, name: str, **params: Any) -> Optional[Any]:
+        query = self._queries[name]
+        connection = await session.connection()
+        row = (await connection.execute(query.statement, params)).first()
+        if row is None:
+            return None
+        return query.row_factory(*row) if query.row_factory is not None else row
+
+
+hot_queries = HotQueryRegistry()
@@ -0,0 +1,171 @@
+# query instrumentation
+
+# branché sur les evenements du moteur (before/after_cursor_execute, handle_error pour les requetes en echec):
+# - histogramme de latence par forme de requete (SQL normalisé)
+# - journal des requetes lentes avec la forme des parametres (types, jamais les valeurs)
+# - statistiques par requete HTTP pour reperer les N+1 (meme forme executée plus de N fois)
+
+import contextvars
+import logging
+import re
+import time
+from collections import Counter
+from typing import TYPE_CHECKING, Dict, Optional
+
+if TYPE_CHECKING:
+    from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+BUCKETS_MS = (0.1, 0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, float("inf"))
+
+# IN (?) et IN (?, ?, ...) sont la meme forme, quel que soit le nombre de valeurs
+_in_list = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_string_literal = re.compile(r"'(?:[^']|'')*'")
+_number_literal = re.compile(r"(?<![\w.])\d+(?:\.\d+)?\b")
+_spaces = re.compile(r"\s+")
+
+
+def normalize_sql(statement: str) -> str:
+    statement = _string_literal.sub("?", statement)
+    statement = _number_literal.sub("?", statement)
+    statement = _in_list.sub("(?...)", statement)
+    return _spaces.sub(" ", statement).strip()
+
+
+def parameter_shape(parameters, executemany: bool) -> str:
+    if executemany:
+        return f"many[{len(parameters)}]"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{key}: {type(value).__name__}" for key, value in parameters.items()) + "}"
+    if isinstance(parameters, (list, tuple)):
+        return "(" + ", ".join(type(value).__name__ for value in parameters) + ")"
+    return type(parameters).__name__
+
+
+class LatencyHistogram:
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self) -> None:
+        self.counts = [0] * len(BUCKETS_MS)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, elapsed_ms: float) -> None:
+        for index, bound in enumerate(BUCKETS_MS):
+            if elapsed_ms <= bound:
+                self.counts[index] += 1
+                break
+        self.count += 1
+        self.total += elapsed_ms
+        self.max = max(self.max, elapsed_ms)
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "avg_ms": self.total / (self.count or 1),
+            "max_ms": self.max,
+            "buckets": {("+Inf" if bound == float("inf") else str(bound)): n for bound, n in zip(BUCKETS_MS, self.counts)},
+        }
+
+
+class RequestQueryStats:
+    __slots__ = ("count", "total_ms", "shapes")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total_ms = 0.0
+        self.shapes: Counter = Counter()
+
+    def summary(self, n_plus_one_threshold: int) -> dict:
+        return {
+            "queries": self.count,
+            "total_ms": self.total_ms,
+            "n_plus_one": [
+                {"sql": sql, "count": count}
+                for sql, count in self.shapes.most_common()
+                if count > n_plus_one_threshold
+            ],
+        }
+
+
+_request_stats: contextvars.ContextVar[Optional[RequestQueryStats]] = contextvars.ContextVar(
+    "request_query_stats", default=None
+)
+
+
+def start_request() -> contextvars.Token:
+    return _request_stats.set(RequestQueryStats())
+
+
+def current_request_stats() -> Optional[RequestQueryStats]:
+    return _request_stats.get()
+
+
+def end_request(token: contextvars.Token) -> Optional[RequestQueryStats]:
+    stats = _request_stats.get()
+    _request_stats.reset(token)
+    return stats
+
+
+class QueryMonitor:
+    def __init__(self, slow_query_ms: float = 100.0, max_shapes: int = 1000) -> None:
+        self.slow_query_ms = float(slow_query_ms)
+        self.max_shapes = int(max_shapes)
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.slow_queries = 0
+
+    def attach(self, engine: "Engine") -> None:
+        from sqlalchemy import event
+
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(engine, "handle_error", self._handle_error)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    # une requete en echec n'atteint pas after_cursor_execute: on retire son depart ici, sinon la pile
+    # grossit sur la connexion (qui vit dans le pool) et decale les mesures des requetes suivantes
+
+    @staticmethod
+    def _handle_error(context) -> None:
+        if context.connection is None or context.execution_context is None:
+            return
+        starts = context.connection.info.get("query_start")
+        if starts:
+            starts.pop()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        elapsed_ms = (time.perf_counter() - conn.info["query_start"].pop()) * 1000
+        sql = normalize_sql(statement)
+
+        histogram = self.histograms.get(sql)
+        if histogram is None:
+            # on borne le nombre de formes suivies pour ne pas grossir sans fin
+            if len(self.histograms) >= self.max_shapes:
+                sql = "<other>"
+                histogram = self.histograms.setdefault(sql, LatencyHistogram())
+            else:
+                histogram = self.histograms[sql] = LatencyHistogram()
+        histogram.observe(elapsed_ms)
+
+        if elapsed_ms >= self.slow_query_ms:
+            self.slow_queries += 1
+            logger.warning(
+                "slow query %.1f ms: %s params=%s", elapsed_ms, sql, parameter_shape(parameters, executemany)
+            )
+
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.count += 1
+            stats.total_ms += elapsed_ms
+            stats.shapes[sql] += 1
+
+    def to_dict(self) -> dict:
+        return {
+            "slow_query_ms": self.slow_query_ms,
+            "slow_queries": self.slow_queries,
+            "statements": {sql: histogram.to_dict() for sql, histogram in self.histograms.items()},
+        }
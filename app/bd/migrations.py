@@ -0,0 +1,144 @@
+# schema migrations
+
+# au demarrage on compare l'empreinte de Base.metadata a celle enregistrée dans la base:
+# identiques -> aucun travail de schema (une seule lecture), differentes -> on prend le verrou d'ecriture
+# (BEGIN IMMEDIATE), on revérifie, puis create_all + migrations ordonnées et on enregistre la nouvelle empreinte
+# plusieurs workers peuvent donc demarrer en meme temps: un seul applique, les autres attendent puis sautent
+
+import hashlib
+import logging
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import MetaData, inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+STATE_TABLE = "schema_state"
+
+
+def metadata_fingerprint(metadata: MetaData) -> str:
+    lines = []
+    for table in sorted(metadata.tables.values(), key=lambda table: table.name):
+        lines.append(f"table {table.name}")
+        for column in table.columns:
+            lines.append(
+                f"  column {column.name} {column.type!r} nullable={column.nullable} "
+                f"pk={column.primary_key} unique={column.unique} "
+                f"server_default={getattr(column.server_default, 'arg', None)!s}"
+            )
+        for index in sorted(table.indexes, key=lambda index: index.name or ""):
+            lines.append(f"  index {index.name} {[c.name for c in index.columns]} unique={index.unique}")
+    return hashlib.sha256("\n".join(lines).encode("utf-8")).hexdigest()
+
+
+# migrations ordonnées: (version, nom, fonction). une migration doit etre idempotente car
+# create_all passe avant elle et peut deja avoir créé ce qu'elle ajoute sur une base neuve
+
+def _add_user_role(conn: Connection) -> None:
+    columns = {column["name"] for column in inspect(conn).get_columns("users")}
+    if "role" not in columns:
+        conn.execute(text("ALTER TABLE users ADD COLUMN role VARCHAR NOT NULL DEFAULT 'customer'"))
+
+
+# la pagination par clé trie sur (created_date, id): une date NULL casserait le curseur et serait sautée
+# par le predicat. les anciennes lignes sans date prennent l'epoch. SQLite ne sait pas modifier une colonne,
+# la table est reconstruite (copie, remplacement, index recréés)
+
+EPOCH = "1970-01-01 00:00:00.000000"
+
+
+def _users_created_date_not_null(conn: Connection) -> None:
+    columns = {column["name"]: column for column in inspect(conn).get_columns("users")}
+    if not columns["created_date"]["nullable"]:
+        return
+    conn.execute(text(
+        "CREATE TABLE users_new (id INTEGER NOT NULL PRIMARY KEY, email VARCHAR NOT NULL, name VARCHAR NOT NULL, "
+        "hash_password VARCHAR NOT NULL, role VARCHAR DEFAULT 'customer' NOT NULL, "
+        "created_date DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL)"
+    ))
+    conn.execute(
+        text(
+            "INSERT INTO users_new (id, email, name, hash_password, role, created_date) "
+            "SELECT id, email, name, hash_password, role, COALESCE(created_date, :epoch) FROM users"
+        ),
+        {"epoch": EPOCH}
+    )
+    conn.execute(text("DROP TABLE users"))
+    conn.execute(text("ALTER TABLE users_new RENAME TO users"))
+    conn.execute(text("CREATE UNIQUE INDEX ix_users_email ON users (email)"))
+    conn.execute(text("CREATE INDEX ix_users_created_date ON users (created_date)"))
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "add users.role", _add_user_role),
+    (2, "users.created_date not null", _users_created_date_not_null),
+]
+
+
+def _read_state(conn: Connection) -> Tuple[Optional[str], int]:
+    try:
+        row = conn.execute(text(f"SELECT fingerprint, version FROM {STATE_TABLE} WHERE id = 1")).first()
+    except OperationalError:
+        return None, 0
+    if row is None:
+        return None, 0
+    return row[0], row[1]
+
+
+def _apply(conn: Connection, metadata: MetaData, fingerprint: str) -> bool:
+    stored_fingerprint, version = _read_state(conn)
+    if stored_fingerprint == fingerprint:
+        return False
+
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {STATE_TABLE} "
+        "(id INTEGER PRIMARY KEY CHECK (id = 1), fingerprint TEXT NOT NULL, version INTEGER NOT NULL, "
+        "applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+    ))
+    metadata.create_all(conn)
+    for migration_version, name, migration in MIGRATIONS:
+        if migration_version > version:
+            logger.info("applying migration %s: %s", migration_version, name)
+            migration(conn)
+            version = migration_version
+
+    conn.execute(
+        text(
+            f"INSERT INTO {STATE_TABLE} (id, fingerprint, version) VALUES (1, :fingerprint, :version) "
+            "ON CONFLICT(id) DO UPDATE SET fingerprint = excluded.fingerprint, version = excluded.version, "
+            "applied_at = CURRENT_TIMESTAMP"
+        ),
+        {"fingerprint": fingerprint, "version": version}
+    )
+    return True
+
+
+async def ensure_schema(read_engine: AsyncEngine, write_engine: AsyncEngine, metadata: MetaData) -> bool:
+    fingerprint = metadata_fingerprint(metadata)
+
+    async with read_engine.connect() as conn:
+        stored_fingerprint, _ = await conn.run_sync(_read_state)
+    if stored_fingerprint == fingerprint:
+        return False
+
+    # la transaction du moteur d'ecriture commence par BEGIN IMMEDIATE: c'est notre verrou entre workers
+    async with write_engine.begin() as conn:
+        applied = await conn.run_sync(_apply, metadata, fingerprint)
+    if applied:
+        logger.info("schema updated to fingerprint %s", fingerprint[:12])
+    return applied
+
+
+# version synchrone pour les outils en ligne de commande (import, resharding)
+
+def ensure_schema_sync(engine: Engine, metadata: MetaData) -> bool:
+    fingerprint = metadata_fingerprint(metadata)
+    with engine.connect() as conn:
+        stored_fingerprint, _ = _read_state(conn)
+    if stored_fingerprint == fingerprint:
+        return False
+    with engine.begin() as conn:
+        return _apply(conn, metadata, fingerprint)
@@ -0,0 +1,80 @@
+# sqlite performance profile
+
+# reglages appliqués a chaque nouvelle connexion SQLite (hook "connect" du moteur)
+# "durable" garde fsync complet, "fast" accepte de perdre les dernieres transactions en cas de coupure
+
+from typing import Dict, List, Optional
+
+PRESETS: Dict[str, Dict[str, object]] = {
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -16000,          # negatif = en Kio, soit ~16 Mo
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "busy_timeout": 5000,
+    },
+    "balanced": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -32000,
+        "mmap_size": 64 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    "fast": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "cache_size": -64000,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+}
+
+# journal_mode en premier: il ne peut pas changer pendant une transaction
+_ORDER = ("journal_mode", "synchronous", "cache_size", "mmap_size", "temp_store", "busy_timeout")
+
+_ALLOWED = {
+    "journal_mode": {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"},
+    "synchronous": {"OFF", "NORMAL", "FULL", "EXTRA"},
+    "temp_store": {"DEFAULT", "FILE", "MEMORY"},
+}
+
+
+def resolve_profile(preset: Optional[str] = "balanced", overrides: Optional[dict] = None) -> Dict[str, object]:
+    preset = preset or "balanced"
+    if preset not in PRESETS:
+        raise ValueError(f"unknown sqlite performance preset: {preset!r}")
+    profile = dict(PRESETS[preset])
+    for name, value in (overrides or {}).items():
+        if name not in _ORDER:
+            raise ValueError(f"unsupported sqlite pragma: {name!r}")
+        if value is not None:
+            profile[name] = value
+    return profile
+
+
+def pragma_statements(profile: Dict[str, object]) -> List[str]:
+    statements = []
+    for name in _ORDER:
+        if name not in profile:
+            continue
+        value = profile[name]
+        if name in _ALLOWED:
+            value = str(value).upper()
+            if value not in _ALLOWED[name]:
+                raise ValueError(f"invalid value for pragma {name}: {value!r}")
+        else:
+            value = int(value)
+        statements.append(f"PRAGMA {name}={value}")
+    return statements
+
+
+def apply_pragmas(dbapi_connection, statements: List[str]) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        for statement in statements:
+            cursor.execute(statement)
+    finally:
+        cursor.close()
@@ -0,0 +1,126 @@
+# sharding module
+
+# un seul fichier SQLite = un seul ecrivain, quel que soit le nombre de coeurs
+# on repartit les utilisateurs sur N fichiers, chacun est un Database complet (pool de lecteurs, ecrivain unique,
+# group commit): les ecritures de shards differents avancent en parallele
+#
+# placement:
+# - une ligne d'id i vit toujours sur le shard i % N: cookie, loader, mises a jour et suppressions ne lisent qu'un fichier
+# - a la creation le shard est choisi par l'email (crc32 % N) et l'id est alloué pour que id % N == shard:
+#   une recherche par email lit d'abord ce shard, les autres ne sont interrogés que si l'email n'y est pas
+#   (email modifié depuis, ou lignes reparties par id par app.cli.reshard)
+# - avec un seul shard, la base est SQLITE_URL comme avant
+# les rares requetes qui traversent les shards (liste paginée, export) passent par scatter_gather
+
+import asyncio
+import zlib
+from contextlib import AbstractAsyncContextManager
+from typing import Any, Awaitable, Callable, Hashable, List, Optional, TypeVar
+
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.future import select
+
+from app.bd.database import Database
+from app.bd.instrumentation import QueryMonitor
+from app.bd.writer import WriteFn
+
+T = TypeVar("T")
+
+
+def shard_index(key: Hashable, shard_count: int) -> int:
+    if isinstance(key, int):
+        return key % shard_count
+    return zlib.crc32(str(key).encode("utf-8")) % shard_count
+
+
+# les ids d'un shard sont choisis pour que id % N == numero du shard: le routage par id retombe
+# toujours sur le shard qui possede la ligne, et les ids restent uniques entre shards
+
+def next_id_for_shard(max_id: int, shard: int, shard_count: int) -> int:
+    candidate = max_id + 1
+    return candidate + (shard - candidate) % shard_count
+
+
+# appelé dans une fonction d'ecriture: la transaction de l'ecrivain (BEGIN IMMEDIATE) tient le verrou du fichier
+# entre la lecture du maximum et l'insertion
+
+async def allocate_id(session: AsyncSession, column, shard: int, shard_count: int) -> int:
+    max_id = await session.scalar(select(func.max(column))) or 0
+    return next_id_for_shard(max_id, shard, shard_count)
+
+
+def shard_urls(db_url: str, shard_count: int, url_template: Optional[str] = None) -> List[str]:
+    if shard_count < 1:
+        raise ValueError("shard_count must be at least 1")
+    if shard_count == 1:
+        return [db_url]
+    if not url_template or "{shard}" not in url_template:
+        raise ValueError("url_template with {shard} is required when shard_count > 1")
+    return [url_template.format(shard=index) for index in range(shard_count)]
+
+
+class ShardedDatabase:
+    def __init__(
+        self,
+        db_url: str,
+        shard_count: int = 1,
+        url_template: Optional[str] = None,
+        slow_query_ms: float = 100.0,
+        **database_kwargs: Any
+    ) -> None:
+        self.shard_count = int(shard_count)
+        # un seul moniteur: les histogrammes et le N+1 d'une requete HTTP regroupent tous les shards
+        self.monitor = QueryMonitor(slow_query_ms=slow_query_ms)
+        self.shards: List[Database] = [
+            Database(url, monitor=self.monitor, **database_kwargs)
+            for url in shard_urls(db_url, self.shard_count, url_template)
+        ]
+
+    def shard_for_id(self, user_id: int) -> int:
+        return shard_index(int(user_id), self.shard_count)
+
+    # l'email doit deja etre normalisé (voir app.user.cache.normalize_email)
+
+    def shard_for_email(self, email: str) -> int:
+        return shard_index(email, self.shard_count)
+
+    @property
+    def engines(self) -> List[AsyncEngine]:
+        return [shard.engine for shard in self.shards]
+
+    def read_session(self, shard: int = 0) -> AbstractAsyncContextManager[AsyncSession]:
+        return self.shards[shard].read_session()
+
+    session = read_session
+
+    async def open_read_session(self, shard: int = 0) -> AsyncSession:
+        return await self.shards[shard].open_read_session()
+
+    async def write(self, shard: int, fn: WriteFn) -> Any:
+        return await self.shards[shard].write(fn)
+
+    async def scatter_gather(self, fn: Callable[[int], Awaitable[T]]) -> List[T]:
+        return list(await asyncio.gather(*(fn(shard) for shard in range(self.shard_count))))
+
+    async def create_database(self) -> bool:
+        return any(await self.scatter_gather(lambda shard: self.shards[shard].create_database()))
+
+    async def warm_up(self) -> None:
+        await self.scatter_gather(lambda shard: self.shards[shard].warm_up())
+
+    async def ping(self) -> None:
+        await self.scatter_gather(lambda shard: self.shards[shard].ping())
+
+    def pool_status(self) -> dict:
+        if self.shard_count == 1:
+            return self.shards[0].pool_status()
+        return {"shards": [shard.pool_status() for shard in self.shards]}
+
+    # chaque shard est fermé meme si un autre echoue, la premiere erreur est relancée ensuite
+
+    async def dispose(self) -> None:
+        results = await asyncio.gather(*(shard.dispose() for shard in self.shards), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
@@ -0,0 +1,111 @@
+# unit of work par requete
+
+# sans portée de requete, chaque methode de repository ouvre sa propre session et sort une connexion du pool:
+# trois repositories = trois sorties de connexion et trois identity maps differentes.
+# le middleware ouvre une portée (contextvar) au debut de la requete: toutes les sessions demandées pendant
+# la requete sont la meme AsyncSession, validée ou annulée une seule fois a la fin.
+# les ecritures passent toujours par l'ecrivain unique (Database.write), la session partagée sert aux lectures
+# faites par les repositories pendant la requete (le loader d'utilisateurs garde ses propres sessions par lot)
+# avec plusieurs shards (voir sharding.py) il y a une session partagée par shard lu pendant la requete
+# une AsyncSession ne supporte pas l'usage concurrent: une autre tache de la requete (asyncio.gather dans un bloc
+# session()) qui la trouve occupée lit avec sa propre session plutot que d'attendre la fin du bloc
+
+import asyncio
+import contextvars
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.bd.sharding import ShardedDatabase
+
+
+class SharedSession:
+    def __init__(self) -> None:
+        self.session: Optional[AsyncSession] = None
+        # tache qui utilise la session: un appel imbriqué de la meme tache la reutilise
+        self.owner: Optional[asyncio.Task] = None
+
+
+class RequestUnitOfWork:
+    def __init__(self) -> None:
+        self.shared: Dict[int, SharedSession] = {}
+        self.session_requests = 0
+        self.checkouts = 0
+
+    def sessions(self) -> List[AsyncSession]:
+        return [shared.session for shared in self.shared.values() if shared.session is not None]
+
+    def to_dict(self) -> dict:
+        return {"session_requests": self.session_requests, "checkouts": self.checkouts}
+
+
+_current: contextvars.ContextVar[Optional[RequestUnitOfWork]] = contextvars.ContextVar(
+    "request_unit_of_work", default=None
+)
+
+
+def current_unit_of_work() -> Optional[RequestUnitOfWork]:
+    return _current.get()
+
+
+class RequestSessionScope:
+    def __init__(self, database: ShardedDatabase) -> None:
+        self.database = database
+        for engine in self.database.engines:
+            event.listen(engine.sync_engine, "checkout", self._on_checkout)
+
+    @staticmethod
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy) -> None:
+        unit_of_work = _current.get()
+        if unit_of_work is not None:
+            unit_of_work.checkouts += 1
+
+    # utilisé par les repositories a la place de Database.read_session
+
+    @asynccontextmanager
+    async def session(self, shard: int = 0) -> AsyncIterator[AsyncSession]:
+        unit_of_work = _current.get()
+        if unit_of_work is None:
+            async with self.database.read_session(shard) as session:
+                yield session
+            return
+
+        unit_of_work.session_requests += 1
+        shared = unit_of_work.shared.setdefault(shard, SharedSession())
+        task = asyncio.current_task()
+        if shared.owner is task:
+            # repository appelé dans le bloc session() d'un autre: meme tache, meme session
+            yield shared.session
+            return
+        if shared.owner is not None:
+            async with self.database.read_session(shard) as session:
+                yield session
+            return
+
+        shared.owner = task
+        try:
+            if shared.session is None:
+                shared.session = await self.database.open_read_session(shard)
+            yield shared.session
+        finally:
+            shared.owner = None
+
+    @asynccontextmanager
+    async def begin(self) -> AsyncIterator[RequestUnitOfWork]:
+        unit_of_work = RequestUnitOfWork()
+        token = _current.set(unit_of_work)
+        try:
+            yield unit_of_work
+        except BaseException:
+            for session in unit_of_work.sessions():
+                await session.rollback()
+            raise
+        else:
+            for session in unit_of_work.sessions():
+                await session.commit()
+        finally:
+            for session in unit_of_work.sessions():
+                await session.close()
+            _current.reset(token)
@@ -0,0 +1,172 @@
+# single writer module
+
+# SQLite n'accepte qu'un ecrivain a la fois: au lieu de laisser chaque session tenter d'ecrire
+# (et recevoir "database is locked"), toutes les ecritures passent par une file asynchrone
+# consommée par une seule connexion dediée
+#
+# group commit: les ecritures arrivées pendant max_delay (au plus max_batch_size) partagent une seule
+# transaction, donc un seul fsync. chaque ecriture tourne dans son propre SAVEPOINT: si elle echoue
+# seule sa partie est annulée et seul son appelant recoit l'erreur
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+logger = logging.getLogger(__name__)
+
+WriteFn = Callable[[AsyncSession], Awaitable[Any]]
+
+
+class _WriteJob:
+    __slots__ = ("fn", "future", "enqueued_at")
+
+    def __init__(self, fn: WriteFn, future: asyncio.Future) -> None:
+        self.fn = fn
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class WriterStats:
+    def __init__(self) -> None:
+        self.executed = 0
+        self.failed = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.max_depth = 0
+        self.batches = 0
+        self.commit_failures = 0
+
+    def record_wait(self, elapsed: float) -> None:
+        self.wait_time_total += elapsed
+        self.wait_time_max = max(self.wait_time_max, elapsed)
+
+
+class SingleWriter:
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        max_queue_size: int = 0,
+        max_batch_size: int = 64,
+        max_delay: float = 0.002
+    ) -> None:
+        self._session_factory = session_factory
+        self._queue: "Optional[asyncio.Queue[_WriteJob]]" = None
+        self._max_queue_size = int(max_queue_size)
+        self.max_batch_size = max(int(max_batch_size), 1)
+        self.max_delay = float(max_delay)
+        self._task: Optional[asyncio.Task] = None
+        self.stats = WriterStats()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._queue = asyncio.Queue(self._max_queue_size)
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, fn: WriteFn) -> Any:
+        self.start()
+        job = _WriteJob(fn, asyncio.get_running_loop().create_future())
+        # file pleine: l'appelant attend ici, ce qui freine les producteurs en heure de pointe
+        await self._queue.put(job)
+        self.stats.max_depth = max(self.stats.max_depth, self._queue.qsize())
+        return await job.future
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            try:
+                await self._execute(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _collect(self) -> List[_WriteJob]:
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_delay
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _execute(self, batch: List[_WriteJob]) -> None:
+        now = time.perf_counter()
+        jobs = []
+        for job in batch:
+            self.stats.record_wait(now - job.enqueued_at)
+            if not job.future.cancelled():
+                jobs.append(job)
+        if not jobs:
+            return
+
+        self.stats.batches += 1
+        outcomes: List[Tuple[_WriteJob, bool, Any]] = []
+        try:
+            async with self._session_factory() as session:
+                async with session.begin():
+                    for job in jobs:
+                        try:
+                            async with session.begin_nested():
+                                outcomes.append((job, True, await job.fn(session)))
+                        except Exception as err:
+                            outcomes.append((job, False, err))
+        except Exception as err:
+            # le commit du lot a echoué: aucune ecriture n'est enregistrée, tous les appelants le savent
+            self.stats.commit_failures += 1
+            self.stats.failed += len(jobs)
+            for job in jobs:
+                if not job.future.done():
+                    job.future.set_exception(err)
+            return
+
+        for job, ok, value in outcomes:
+            if ok:
+                self.stats.executed += 1
+            else:
+                self.stats.failed += 1
+            if job.future.done():
+                continue
+            if ok:
+                job.future.set_result(value)
+            else:
+                job.future.set_exception(value)
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        # on vide la file avant d'arreter pour ne perdre aucune ecriture deja acceptée
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def to_dict(self) -> dict:
+        executed = self.stats.executed + self.stats.failed
+        return {
+            "depth": self.depth,
+            "max_depth": self.stats.max_depth,
+            "executed": self.stats.executed,
+            "failed": self.stats.failed,
+            "batches": self.stats.batches,
+            "avg_batch_size": executed / (self.stats.batches or 1),
+            "commit_failures": self.stats.commit_failures,
+            "wait_avg_ms": self.stats.wait_time_total / (executed or 1) * 1000,
+            "wait_max_ms": self.stats.wait_time_max * 1000,
+        }
@@ -0,0 +1,43 @@
+# outils communs des commandes en ligne
+
+import os
+from typing import Optional
+
+import yaml
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+
+from app.bd.pragmas import apply_pragmas, pragma_statements, resolve_profile
+
+
+def load_config(path: str = "config.yml") -> dict:
+    with open(path, encoding="utf-8") as fh:
+        return yaml.safe_load(fh)["services"]["app"]
+
+
+# les outils tournent hors de la boucle asyncio: meme fichier, pilote sqlite synchrone
+
+def sync_url(db_url: str) -> str:
+    return db_url.replace("+aiosqlite", "")
+
+
+def sqlite_path(db_url: str) -> str:
+    path = sync_url(db_url).split("sqlite:///", 1)[1]
+    return os.path.abspath(path)
+
+
+def create_sync_engine(db_url: str, performance: Optional[dict] = None) -> Engine:
+    performance = performance or {}
+    statements = pragma_statements(resolve_profile(performance.get("preset"), performance.get("overrides")))
+    engine = create_engine(sync_url(db_url))
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record) -> None:
+        apply_pragmas(dbapi_connection, statements)
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def on_begin(conn) -> None:
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    return engine
@@ -0,0 +1,255 @@
+# import massif d'utilisateurs (reprise des clients d'une franchise)
+#
+#   python -m app.cli.import_users customers.csv
+#   python -m app.cli.import_users customers.jsonl --chunk-size 10000 --workers 8
+#
+# le fichier est lu en flux (CSV avec entete email,name,password ou JSONL), chaque ligne est validée
+# par UserCreate, les mots de passe sont hashés sur tous les coeurs et les lignes sont inserées par lots
+# (executemany) avec une transaction par lot. apres chaque lot le point de reprise est ecrit:
+# relancer la meme commande reprend apres la derniere ligne validée. les emails deja presents sont ignorés.
+# avec plusieurs shards (services.app.sharding) chaque ligne va sur le shard de son email, comme une creation
+# faite par l'application (voir app/bd/sharding.py)
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import func, insert, select
+from sqlalchemy.engine import Engine
+
+from app.auth import hashing
+from app.bd.database import Base
+from app.bd.migrations import ensure_schema_sync
+from app.bd.sharding import next_id_for_shard, shard_index, shard_urls
+from app.cli.common import create_sync_engine, load_config
+from app.user.models import User
+from app.user.schemas import UserCreate
+
+
+# une ligne JSONL illisible n'arrete pas l'import: elle garde son numero de ligne et finit dans les rejets
+# comme une ligne invalide, sinon chaque reprise retomberait sur elle
+
+class InvalidLine(NamedTuple):
+    error: str
+
+
+def read_records(path: str, fmt: str) -> Iterator[Any]:
+    with open(path, newline="", encoding="utf-8") as fh:
+        if fmt == "csv":
+            yield from csv.DictReader(fh)
+        else:
+            for line in fh:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as err:
+                    record = InvalidLine(str(err))
+                yield record
+
+
+def _hash_batch(passwords: List[str]) -> List[str]:
+    context = hashing._get_context()
+    return [context.hash(password) for password in passwords]
+
+
+def _split(items: list, parts: int) -> List[list]:
+    size = max(1, -(-len(items) // parts))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+class Checkpoint:
+    def __init__(self, path: str, source: str) -> None:
+        self.path = path
+        self.source = os.path.abspath(source)
+        self.rows_done = 0
+        self.inserted = 0
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as fh:
+                state = json.load(fh)
+            if state.get("source") == self.source:
+                self.rows_done = state["rows_done"]
+                self.inserted = state.get("inserted", 0)
+
+    def save(self) -> None:
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump({"source": self.source, "rows_done": self.rows_done, "inserted": self.inserted}, fh)
+        os.replace(tmp, self.path)
+
+
+# les rejets sont ecrits avant le point de reprise du lot: a la reprise on retire ceux des lignes
+# qui vont etre relues, sinon ils apparaitraient deux fois. un nouvel import repart d'un fichier vide
+
+def truncate_rejects(path: str, rows_done: int) -> None:
+    if not os.path.exists(path):
+        return
+    tmp = f"{path}.tmp"
+    with open(path, encoding="utf-8") as src, open(tmp, "w", encoding="utf-8") as dst:
+        for line in src:
+            if line.strip() and json.loads(line)["row"] <= rows_done:
+                dst.write(line)
+    os.replace(tmp, path)
+
+
+# meme cout bcrypt que le serveur: rounds fixé, sinon le cout calibré et enregistré (voir app/auth/hashing.py)
+# un import au cout par defaut de passlib ferait rehasher chaque utilisateur a sa premiere connexion
+
+def resolve_rounds(hashing_config: dict) -> Optional[int]:
+    if hashing_config.get("rounds"):
+        return int(hashing_config["rounds"])
+    if not hashing_config.get("latency_budget_ms"):
+        return None
+    return hashing.load_or_calibrate(
+        hashing_config.get("calibration_path"),
+        float(hashing_config["latency_budget_ms"]),
+        int(hashing_config.get("min_rounds", 10)),
+        int(hashing_config.get("max_rounds", 15))
+    )
+
+
+# un enregistrement qui n'est pas un objet (liste, nombre...) est rejeté par model_validate (model_type)
+
+def validate_chunk(records: List[Any], first_row: int, rejects) -> Tuple[List[UserCreate], int]:
+    users = []
+    rejected = 0
+    for offset, record in enumerate(records):
+        if isinstance(record, InvalidLine):
+            errors = [{"type": "json_invalid", "loc": [], "msg": f"Invalid JSON: {record.error}"}]
+        else:
+            try:
+                users.append(UserCreate.model_validate(record))
+                continue
+            except ValidationError as err:
+                errors = err.errors(include_url=False)
+        rejected += 1
+        rejects.write(json.dumps({"row": first_row + offset, "errors": errors}, default=str) + "\n")
+    return users, rejected
+
+
+# un lot par shard, chacun dans sa transaction. les ids sont alloués comme allocate_id (id % N == shard)
+# et un email deja present sur un autre shard est ignoré comme OR IGNORE le fait sur le shard de la ligne.
+# relire un lot deja inseré a la reprise n'insere rien de plus
+
+def insert_rows(engines: List[Engine], rows: List[dict]) -> int:
+    statement = insert(User.__table__).prefix_with("OR IGNORE")
+    shard_count = len(engines)
+    if shard_count == 1:
+        with engines[0].begin() as conn:
+            return conn.execute(statement, rows).rowcount
+
+    by_shard: Dict[int, List[dict]] = {}
+    for row in rows:
+        by_shard.setdefault(shard_index(row["email"], shard_count), []).append(row)
+
+    inserted = 0
+    for shard, shard_rows in by_shard.items():
+        emails = [row["email"] for row in shard_rows]
+        taken = set()
+        for other, engine in enumerate(engines):
+            if other != shard:
+                with engine.connect() as conn:
+                    taken.update(conn.execute(select(User.email).where(User.email.in_(emails))).scalars())
+        shard_rows = [row for row in shard_rows if row["email"] not in taken]
+        if not shard_rows:
+            continue
+        with engines[shard].begin() as conn:
+            first_id = next_id_for_shard(conn.execute(select(func.max(User.id))).scalar() or 0, shard, shard_count)
+            for offset, row in enumerate(shard_rows):
+                row["id"] = first_id + offset * shard_count
+            inserted += conn.execute(statement, shard_rows).rowcount
+    return inserted
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="bulk import users from CSV or JSONL")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=("csv", "jsonl"))
+    parser.add_argument("--config", default="config.yml")
+    parser.add_argument("--db-url", help="single database url, defaults to the configured shards")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--rounds", type=int, help="bcrypt cost, defaults to the server's configured or calibrated cost")
+    parser.add_argument("--checkpoint")
+    args = parser.parse_args(argv)
+
+    config = load_config(args.config)
+    sharding = config.get("sharding") or {}
+    if args.db_url:
+        db_urls = [args.db_url]
+    else:
+        db_urls = shard_urls(
+            config["environnement"]["SQLITE_URL"], int(sharding.get("shards", 1)), sharding.get("url_template")
+        )
+    fmt = args.format or ("csv" if args.path.endswith(".csv") else "jsonl")
+    rounds = args.rounds or resolve_rounds(config.get("hashing") or {})
+    checkpoint = Checkpoint(args.checkpoint or f"{args.path}.checkpoint", args.path)
+    rejects_path = f"{args.path}.rejects"
+    truncate_rejects(rejects_path, checkpoint.rows_done)
+
+    engines = [create_sync_engine(db_url, config.get("performance")) for db_url in db_urls]
+    for engine in engines:
+        ensure_schema_sync(engine, Base.metadata)
+
+    records = islice(read_records(args.path, fmt), checkpoint.rows_done, None)
+    if checkpoint.rows_done:
+        print(f"resuming after row {checkpoint.rows_done}", file=sys.stderr)
+
+    started = time.perf_counter()
+    processed = 0
+    read_rows = checkpoint.rows_done
+    rejected = 0
+    with ProcessPoolExecutor(args.workers, initializer=hashing._configure_context, initargs=(rounds,)) as pool, \
+            open(rejects_path, "a", encoding="utf-8") as rejects:
+
+        def prepare() -> Optional[Tuple[int, List[UserCreate], List[Future]]]:
+            nonlocal rejected, read_rows
+            chunk = list(islice(records, args.chunk_size))
+            if not chunk:
+                return None
+            users, chunk_rejected = validate_chunk(chunk, read_rows + 1, rejects)
+            read_rows += len(chunk)
+            rejected += chunk_rejected
+            passwords = [user.password for user in users]
+            futures = [pool.submit(_hash_batch, part) for part in _split(passwords, args.workers)] if passwords else []
+            return len(chunk), users, futures
+
+        # le hash du lot suivant tourne pendant l'insertion du lot courant
+        pending = prepare()
+        while pending is not None:
+            chunk_rows, users, futures = pending
+            hashes = [hashed for future in futures for hashed in future.result()]
+            processed += chunk_rows
+            pending = prepare()
+
+            rows = [
+                {"email": user.email.lower().strip(), "name": user.name or "", "hash_password": hashed}
+                for user, hashed in zip(users, hashes)
+            ]
+            inserted = insert_rows(engines, rows) if rows else 0
+            checkpoint.rows_done += chunk_rows
+            checkpoint.inserted += inserted
+            checkpoint.save()
+
+            elapsed = time.perf_counter() - started
+            print(
+                f"{checkpoint.rows_done} rows ({checkpoint.inserted} inserted, {rejected} rejected) "
+                f"{processed / elapsed:.0f} rows/s",
+                file=sys.stderr
+            )
+
+    for engine in engines:
+        engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
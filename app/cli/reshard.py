@@ -0,0 +1,91 @@
+# decoupage d'un fichier SQLite existant en N shards
+#
+#   python -m app.cli.reshard ./test.db --shards 4 --output "./test.shard{shard}.db"
+#   python -m app.cli.reshard ./test.db --shards 4 --key users=id --key orders=store_id
+#
+# chaque shard recoit le schema complet (tables et index) et les lignes dont la clé est routée vers lui
+# avec la meme fonction que l'application (app.bd.sharding.shard_index). les tables sans clé de
+# routage (par exemple schema_state) sont copiées entieres dans chaque shard
+# les utilisateurs sont repartis par id (id % N): les ids existants et les cookies restent valides, et une
+# recherche par email qui ne trouve pas la ligne sur le shard de l'email interroge les autres.
+# ensuite: sharding.shards = N et sharding.url_template = le meme modele (en sqlite+aiosqlite:///) dans config.yml
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from typing import Dict, List, Optional
+
+from app.bd.sharding import shard_index
+
+DEFAULT_KEYS = {"users": "id"}
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def reshard(source: str, shard_count: int, output_template: str, keys: Dict[str, str]) -> List[str]:
+    outputs = []
+    for shard in range(shard_count):
+        path = output_template.format(shard=shard)
+        if os.path.exists(path):
+            raise FileExistsError(f"{path} already exists")
+
+        started = time.perf_counter()
+        conn = sqlite3.connect(path, isolation_level=None)
+        conn.create_function("shard_of", 2, shard_index, deterministic=True)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("ATTACH DATABASE ? AS src", (os.path.abspath(source),))
+        schema = conn.execute(
+            "SELECT type, name, tbl_name, sql FROM src.sqlite_master "
+            "WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' ORDER BY type = 'index'"
+        ).fetchall()
+
+        conn.execute("BEGIN")
+        for kind, name, table, sql in schema:
+            conn.execute(sql)
+        for kind, name, table, sql in schema:
+            if kind != "table":
+                continue
+            key = keys.get(name)
+            if key is None:
+                conn.execute(f"INSERT INTO main.{_quote(name)} SELECT * FROM src.{_quote(name)}")
+            else:
+                conn.execute(
+                    f"INSERT INTO main.{_quote(name)} SELECT * FROM src.{_quote(name)} "
+                    f"WHERE shard_of({_quote(key)}, ?) = ?",
+                    (shard_count, shard)
+                )
+        conn.execute("COMMIT")
+        conn.execute("DETACH DATABASE src")
+        rows = {
+            name: conn.execute(f"SELECT count(*) FROM {_quote(name)}").fetchone()[0]
+            for kind, name, table, sql in schema if kind == "table"
+        }
+        conn.close()
+        print(f"shard {shard}: {path} {rows} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+        outputs.append(path)
+    return outputs
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="split a SQLite database into hash shards")
+    parser.add_argument("source")
+    parser.add_argument("--shards", type=int, required=True)
+    parser.add_argument("--output", help="path template with {shard}, defaults to <source>.shard{shard}.db")
+    parser.add_argument("--key", action="append", default=[], help="table=column routing key, users=id by default")
+    args = parser.parse_args(argv)
+
+    keys = dict(DEFAULT_KEYS)
+    for item in args.key:
+        table, _, column = item.partition("=")
+        keys[table] = column
+    root, _ = os.path.splitext(args.source)
+    reshard(args.source, args.shards, args.output or root + ".shard{shard}.db", keys)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,25 +1,117 @@
+import importlib
+from typing import Any, Callable
+
 from dependency_injector import containers, providers
-from app.auth.repositories import AuthRepositories
+from app.auth.hashing import PasswordHasher
+from app.auth.singleflight import SingleFlight
 from app.auth.services import AuthServices
-from app.bd.database import Database
+from app.core.cookies.session_store import SessionStore
+from app.core.viewmodels import config as app_config
+from app.user.cache import UserCache
+from app.user.services import UserServices
 from app import bd
 
 
+# les classes qui tirent sqlalchemy (moteurs, sessions, repositories) sont importées au premier appel
+# du provider, c'est a dire au lifespan ou a la premiere requete: "import main" n'importe pas sqlalchemy
+
+def _lazy(path: str) -> Callable[..., Any]:
+    module_name, name = path.split(":")
+
+    def create(*args: Any, **kwargs: Any) -> Any:
+        return getattr(importlib.import_module(module_name), name)(*args, **kwargs)
+
+    create.__qualname__ = name
+    return create
+
+
 
 class Containers(containers.DeclarativeContainer):
     config = providers.Configuration()
     
-    bd = providers.Singleton(Database, db_url = config.services.app.environnement.SQLITE_URL)
+    # un Database par shard (voir app/bd/sharding.py), un seul shard = le fichier SQLITE_URL
+    bd = providers.Singleton(
+        _lazy("app.bd.sharding:ShardedDatabase"),
+        db_url = config.services.app.environnement.SQLITE_URL,
+        shard_count = config.services.app.sharding.shards,
+        url_template = config.services.app.sharding.url_template,
+        pool_size = config.services.app.database.pool_size,
+        max_overflow = config.services.app.database.max_overflow,
+        pool_timeout = config.services.app.database.pool_timeout,
+        pool_recycle = config.services.app.database.pool_recycle,
+        performance_preset = config.services.app.performance.preset,
+        performance_overrides = config.services.app.performance.overrides,
+        writer_queue_size = config.services.app.database.writer_queue_size,
+        group_commit_max_batch_size = config.services.app.database.group_commit.max_batch_size,
+        group_commit_max_delay_ms = config.services.app.database.group_commit.max_delay_ms,
+        slow_query_ms = config.services.app.instrumentation.slow_query_ms
+    )
+    
+    # une session partagée par requete HTTP, ouverte et fermée par UnitOfWorkMiddleware
+    request_session = providers.Singleton(_lazy("app.bd.unit_of_work:RequestSessionScope"), database = bd)
     
+    password_hasher = providers.Singleton(
+        PasswordHasher,
+        pool_size = config.services.app.hashing.pool_size,
+        queue_depth = config.services.app.hashing.queue_depth,
+        timeout = config.services.app.hashing.timeout,
+        rounds = config.services.app.hashing.rounds,
+        latency_budget_ms = config.services.app.hashing.latency_budget_ms,
+        min_rounds = config.services.app.hashing.min_rounds,
+        max_rounds = config.services.app.hashing.max_rounds,
+        calibration_path = config.services.app.hashing.calibration_path
+    )
+    
+    login_flights = providers.Singleton(SingleFlight)
+    
+    user_loader = providers.Singleton(_lazy("app.user.loaders:UserLoader"), database= bd)
+    
+    user_cache = providers.Singleton(
+        UserCache,
+        max_size = config.services.app.user_cache.max_size,
+        ttl = config.services.app.user_cache.ttl
+    )
+    
+    session_store = providers.Singleton(
+        SessionStore,
+        path = config.services.app.sessions.path,
+        max_entries = config.services.app.sessions.max_entries,
+        idle_ttl = config.services.app.sessions.idle_ttl,
+        persist_ttl = config.services.app.sessions.persist_ttl,
+        flush_interval = config.services.app.sessions.flush_interval,
+        sweep_interval = config.services.app.sessions.sweep_interval,
+        token_max_age = app_config.AUTH_COOKIE_MAX_AGE
+    )
     
 # auth 
 
-auth_reporsitory = providers.Factory(
-    AuthRepositories,
-    session_factory= bd.provided.session
-)
+    auth_reporsitory = providers.Factory(
+        _lazy("app.auth.repositories:AuthRepositories"),
+        session_factory= request_session.provided.session,
+        database= bd,
+        password_hasher= password_hasher,
+        login_flights= login_flights,
+        user_loader= user_loader,
+        user_cache= user_cache
+    )
+
+    auth_services = providers.Factory(
+        AuthServices,
+        auth_repository=auth_reporsitory
+    )
+
+# user 
+
+    user_repository = providers.Factory(
+        _lazy("app.user.repositories:UserRepositories"),
+        session_factory= request_session.provided.session,
+        database= bd,
+        user_cache= user_cache,
+        session_store= session_store
+    )
 
-auth_services = providers.Factory(
-    AuthServices,
-    auth_reporsitory=auth_reporsitory
-)
\ No newline at end of file
+    user_services = providers.Factory(
+        UserServices,
+        user_repository=user_repository,
+        export_chunk_size=config.services.app.exports.chunk_size
+    )
@@ -1,47 +1,165 @@
 # cookie authentification models
 
-from typing import Optional
-import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
 from fastapi import (
+    HTTPException,
     Request,
-    Response
+    Response,
+    status
 )
+from starlette.requests import HTTPConnection
+from app.core.cookies import tokens
+from app.core.cookies.session_store import SessionStore
+from app.core.cookies.tokens import SessionToken
 from app.core.viewmodels import config 
 
+logger = logging.getLogger(__name__)
+
 auth_cookie_name = config.AUTH_COOKIE_NAME
+session_cookie_name = config.SESSION_COOKIE_NAME
+
+_secrets = [secret.encode("utf-8") for secret in config.AUTH_COOKIE_SECRETS]
+
+# cookies deja verifiés: valeur du cookie -> jeton decodé
+# les sessions actives evitent ainsi le decodage et le calcul du HMAC a chaque requete
+_verified: "OrderedDict[str, SessionToken]" = OrderedDict()
 
 
 # quand mon utilisateur se connecte sur mon systeme, je vais créer un cookie
+# le cookie est un jeton signé qui contient id, nom et role (voir tokens.py)
+
+def set_auth(response:Response, user_id:int, name:str = "", role:str = "customer")-> None:
+    config.check_auth_secrets()
+    val = tokens.encode_token(_secrets[0], user_id, name, role, config.AUTH_COOKIE_MAX_AGE)
+    response.set_cookie(
+        auth_cookie_name,
+        val,
+        max_age=config.AUTH_COOKIE_MAX_AGE,
+        secure=False,
+        httponly=True,
+        samesite="Lax"
+    )
+
+
+# la revocation passe par le SessionStore pour etre vue par tous les workers
+
+async def logout(response:Response, session:Optional[SessionToken] = None, store:Optional[SessionStore] = None)-> None:
+    if session is not None:
+        if store is not None:
+            await store.revoke_token(session.session_id, session.expires)
+        else:
+            tokens.revoke(session.session_id, session.expires)
+    response.delete_cookie(auth_cookie_name)
+
+
+def verify_auth_value(val:str)-> Optional[SessionToken]:
+    now = time.time()
+    session = _verified.get(val)
+    if session is not None:
+        if session.is_valid(now):
+            _verified.move_to_end(val)
+            return session
+        del _verified[val]
+        return None
+
+    if not _secrets:
+        return None
+    session = tokens.decode_token(_secrets, val)
+    if session is None:
+        logger.debug("invalid auth token")
+        return None
+    if not session.is_valid(now):
+        return None
 
-def set_auth(response:Response, user_id:int)-> None:
-    hash_user_id = __hash_text(str(user_id))
-    val= f"{user_id}:{hash_user_id}"
-    response.set_cookie(auth_cookie_name,val, secure=False, httponly=True, samesite="Lax")
-    
-    
-    
-def __hash_text(text:str):
-    text = "_salty"+text+"__text"
-    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+    _verified[val] = session
+    if len(_verified) > config.AUTH_COOKIE_CACHE_SIZE:
+        _verified.popitem(last=False)
+    return session
 
 
-# recupération de user id a travers les cookies 
+# recupération de la session a travers les cookies 
 # request pour récupérer des données d'une page web 
 
-def get_user_id_via_cookie(request:Request)-> Optional[int]:
+def get_session_via_cookie(request:HTTPConnection)-> Optional[SessionToken]:
     if auth_cookie_name not in request.cookies:
         return None
-    val = request.cookies[auth_cookie_name]
-    
-    part= val.split()
-    
-    if len(part) !=2:
+    return verify_auth_value(request.cookies[auth_cookie_name])
+
+
+def get_user_id_via_cookie(request:HTTPConnection)-> Optional[int]:
+    session = get_session_via_cookie(request)
+    return session.user_id if session is not None else None
+
+
+# les clients API envoient le meme jeton dans l'entete Authorization: Bearer <jeton>
+
+def get_session_via_bearer(connection:HTTPConnection)-> Optional[SessionToken]:
+    authorization = connection.headers.get("authorization")
+    if not authorization:
         return None
-    user_id = part[0]
-    hash_user_id = part[1]
-    
-    hash_user_id_cheek = __hash_text(user_id)
-    
-    if hash_user_id_cheek != hash_user_id:
-        print("invalid cookies")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
         return None
+    return verify_auth_value(token.strip())
+
+
+def authenticate(connection:HTTPConnection)-> Optional[SessionToken]:
+    session = get_session_via_bearer(connection)
+    if session is None:
+        session = get_session_via_cookie(connection)
+    return session
+
+
+# le middleware d'authentification a deja fait le travail, on relit son resultat
+
+_missing = object()
+
+def get_session(request:Request)-> Optional[SessionToken]:
+    session = getattr(request.state, "session", _missing)
+    if session is _missing:
+        return authenticate(request)
+    return session
+
+
+def get_user_id(request:Request)-> Optional[int]:
+    session = get_session(request)
+    return session.user_id if session is not None else None
+
+
+# dependance des routes reservées aux administrateurs (exports, /metrics)
+# le role vient du jeton: changer le role ou supprimer le compte refuse les jetons deja emis
+# (SessionStore.invalidate_user, appelé par UserRepositories)
+
+def require_admin(request:Request)-> None:
+    session = get_session(request)
+    if session is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="not authenticated")
+    if session.role != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="admin only")
+
+
+# le cookie de session ne contient qu'un identifiant opaque, les donnees sont dans le SessionStore
+
+def set_session_cookie(response:Response, session_id:str)-> None:
+    response.set_cookie(session_cookie_name, session_id, secure=False, httponly=True, samesite="Lax")
+
+
+def get_session_id_via_cookie(request:HTTPConnection)-> Optional[str]:
+    return request.cookies.get(session_cookie_name)
+
+
+# donnees de session de la requete: celles du cookie si le store les connait encore, sinon une nouvelle
+# session vide, enregistrée dans le store pour que son identifiant reste le meme aux requetes suivantes
+
+async def load_session_data(request:HTTPConnection, response:Response, store:SessionStore)-> Tuple[str, dict]:
+    session_id = get_session_id_via_cookie(request)
+    data = await store.get(session_id) if session_id else None
+    if data is None:
+        session_id, data = store.new_session_id(), {}
+        store.set(session_id, data)
+        set_session_cookie(response, session_id)
+    return session_id, data
@@ -0,0 +1,373 @@
+# session store module
+
+# donnees de session trop grosses pour le cookie (panier, etape de commande)
+# niveau 1: memoire (LRU + expiration apres inactivité), lecture sans I/O
+# niveau 2: fichier SQLite pour le debordement et les redemarrages
+# les sessions modifiées sont ecrites en lot par une tache de fond (write-behind)
+#
+# le fichier SQLite est partagé par les workers du lanceur: il porte aussi les jetons revoqués et un journal
+# de changements (table changes). chaque worker y ecrit les sessions qu'il a modifiées et les invalidations
+# publiées (cache d'utilisateurs), et relit a chaque tour celles des autres workers: une copie en memoire
+# perimée par un autre worker est abandonnée au plus tard un tour de flush apres l'ecriture
+
+import asyncio
+import json
+import logging
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.core.cookies import tokens
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    __slots__ = ("data", "last_access")
+
+    def __init__(self, data: dict, last_access: float) -> None:
+        self.data = data
+        self.last_access = last_access
+
+
+class SessionStoreMetrics:
+    def __init__(self) -> None:
+        self.memory_hits = 0
+        self.sqlite_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.flush_time_total = 0.0
+        self.flush_time_max = 0.0
+
+    def record_flush(self, rows: int, elapsed: float) -> None:
+        self.flushes += 1
+        self.flushed_rows += rows
+        self.flush_time_total += elapsed
+        self.flush_time_max = max(self.flush_time_max, elapsed)
+
+    def to_dict(self) -> dict:
+        reads = self.memory_hits + self.sqlite_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "sqlite_hits": self.sqlite_hits,
+            "misses": self.misses,
+            "memory_hit_rate": self.memory_hits / reads if reads else 0.0,
+            "sqlite_hit_rate": self.sqlite_hits / reads if reads else 0.0,
+            "evictions": self.evictions,
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "flush_avg_ms": self.flush_time_total / (self.flushes or 1) * 1000,
+            "flush_max_ms": self.flush_time_max * 1000,
+        }
+
+
+class SessionStore:
+    def __init__(
+        self,
+        path: str = "./sessions.db",
+        max_entries: int = 10000,
+        idle_ttl: float = 1800.0,
+        persist_ttl: float = 60 * 60 * 24 * 14,
+        flush_interval: float = 1.0,
+        sweep_interval: float = 300.0,
+        token_max_age: int = 60 * 60 * 24 * 14
+    ) -> None:
+        self.path = path
+        self.max_entries = int(max_entries)
+        self.idle_ttl = float(idle_ttl)
+        self.persist_ttl = float(persist_ttl)
+        self.flush_interval = float(flush_interval)
+        self.sweep_interval = float(sweep_interval)
+        self.token_max_age = int(token_max_age)
+        self.metrics = SessionStoreMetrics()
+        self._memory: "OrderedDict[str, _Entry]" = OrderedDict()
+        # sessions modifiées pas encore ecrites (None = supprimée); elles restent lisibles meme apres eviction
+        self._dirty: Dict[str, Optional[dict]] = {}
+        self._db_lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_sessions_updated_at ON sessions (updated_at)")
+        # jetons revoqués, partagés par tous les workers; AUTOINCREMENT: les id ne sont jamais reutilisés,
+        # chaque worker relit les lignes au dela du dernier id vu
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS revoked_tokens "
+            "(id INTEGER PRIMARY KEY AUTOINCREMENT, session_id BLOB NOT NULL UNIQUE, expires REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_revoked_tokens_expires ON revoked_tokens (expires)")
+        self._last_revoked_id = 0
+        # revocation par utilisateur (voir tokens.invalidate_user): la table est relue au demarrage d'un worker,
+        # les workers deja lancés la recoivent par le journal de changements
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS user_not_before "
+            "(user_id INTEGER PRIMARY KEY, not_before INTEGER NOT NULL, expires REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS changes (id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, "
+            "key TEXT NOT NULL, origin INTEGER NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_changes_created_at ON changes (created_at)")
+        # identifiant de ce processus dans le journal (un pid peut etre reutilisé apres un redemarrage)
+        self._origin = secrets.randbits(62)
+        self._last_change_id: Optional[int] = None
+        self._outbox: List[Tuple[str, str]] = []
+        self._subscribers: Dict[str, List[Callable[[str], None]]] = {
+            "session": [self._on_remote_session],
+            "user_not_before": [lambda key: tokens.merge_not_before([tuple(json.loads(key))])],
+        }
+        self._flush_task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def new_session_id() -> str:
+        return secrets.token_urlsafe(24)
+
+    async def get(self, session_id: str) -> Optional[dict]:
+        now = time.monotonic()
+        entry = self._memory.get(session_id)
+        if entry is not None:
+            if now - entry.last_access <= self.idle_ttl:
+                entry.last_access = now
+                self._memory.move_to_end(session_id)
+                self.metrics.memory_hits += 1
+                return entry.data
+            del self._memory[session_id]
+
+        if session_id in self._dirty:
+            data = self._dirty[session_id]
+            if data is None:
+                self.metrics.misses += 1
+                return None
+            self.metrics.memory_hits += 1
+        else:
+            data = await asyncio.to_thread(self._load, session_id)
+            if data is None:
+                self.metrics.misses += 1
+                return None
+            self.metrics.sqlite_hits += 1
+
+        self._remember(session_id, data, now)
+        return data
+
+    def set(self, session_id: str, data: dict) -> None:
+        self._remember(session_id, data, time.monotonic())
+        self._dirty[session_id] = data
+
+    def delete(self, session_id: str) -> None:
+        self._memory.pop(session_id, None)
+        self._dirty[session_id] = None
+
+    def _remember(self, session_id: str, data: dict, now: float) -> None:
+        self._memory[session_id] = _Entry(data, now)
+        self._memory.move_to_end(session_id)
+        while len(self._memory) > self.max_entries:
+            # une session evincée reste sur disque (ou dans _dirty jusqu'au prochain flush)
+            self._memory.popitem(last=False)
+            self.metrics.evictions += 1
+
+    def _load(self, session_id: str) -> Optional[dict]:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT data, updated_at FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+        if row is None or row[1] < time.time() - self.persist_ttl:
+            return None
+        return json.loads(row[0])
+
+    def _write(
+        self,
+        upserts: List[Tuple[str, str, float]],
+        deletes: List[Tuple[str]],
+        changes: List[Tuple[str, str, int, float]]
+    ) -> None:
+        with self._db_lock:
+            self._db.execute("BEGIN")
+            try:
+                if changes:
+                    self._db.executemany(
+                        "INSERT INTO changes (kind, key, origin, created_at) VALUES (?, ?, ?, ?)", changes
+                    )
+                if upserts:
+                    self._db.executemany(
+                        "INSERT INTO sessions (id, data, updated_at) VALUES (?, ?, ?) "
+                        "ON CONFLICT(id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                        upserts
+                    )
+                if deletes:
+                    self._db.executemany("DELETE FROM sessions WHERE id = ?", deletes)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    # purge des lignes expirées: rare (sweep_interval), et une recherche d'intervalle dans les index
+
+    def _sweep(self) -> None:
+        now = time.time()
+        with self._db_lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.execute("DELETE FROM sessions WHERE updated_at < ?", (now - self.persist_ttl,))
+                self._db.execute("DELETE FROM revoked_tokens WHERE expires < ?", (now,))
+                self._db.execute("DELETE FROM user_not_before WHERE expires < ?", (now,))
+                # un worker relit le journal a chaque tour: les lignes plus vieilles qu'un balayage sont deja lues
+                self._db.execute("DELETE FROM changes WHERE created_at < ?", (now - self.sweep_interval,))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    # revocation de jeton (deconnexion): ecrite tout de suite, les autres workers la lisent au prochain flush
+
+    async def revoke_token(self, session_id: bytes, expires: int) -> None:
+        tokens.revoke(session_id, expires)
+        await asyncio.to_thread(self._insert_revoked, session_id, expires)
+
+    def _insert_revoked(self, session_id: bytes, expires: int) -> None:
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO revoked_tokens (session_id, expires) VALUES (?, ?)", (session_id, expires)
+            )
+
+    def _load_revoked(self) -> List[Tuple[int, bytes, int]]:
+        with self._db_lock:
+            return self._db.execute(
+                "SELECT id, session_id, expires FROM revoked_tokens WHERE id > ? AND expires >= ? ORDER BY id",
+                (self._last_revoked_id, time.time())
+            ).fetchall()
+
+    async def sync_revoked(self) -> int:
+        rows = await asyncio.to_thread(self._load_revoked)
+        if rows:
+            self._last_revoked_id = rows[-1][0]
+            tokens.merge_revoked((session_id, expires) for _, session_id, expires in rows)
+        tokens.prune_revoked()
+        return len(rows)
+
+    # tous les jetons deja emis pour cet utilisateur sont refusés (compte supprimé, role changé)
+
+    async def invalidate_user(self, user_id: int) -> None:
+        not_before, expires = tokens.invalidate_user(user_id, self.token_max_age)
+        await asyncio.to_thread(self._insert_not_before, user_id, not_before, expires)
+        self.publish("user_not_before", json.dumps([user_id, not_before, expires]))
+
+    def _insert_not_before(self, user_id: int, not_before: int, expires: int) -> None:
+        with self._db_lock:
+            self._db.execute(
+                "INSERT INTO user_not_before (user_id, not_before, expires) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET not_before = excluded.not_before, expires = excluded.expires "
+                "WHERE excluded.not_before > user_not_before.not_before",
+                (user_id, not_before, expires)
+            )
+
+    def _load_not_before(self) -> List[Tuple[int, int, int]]:
+        with self._db_lock:
+            return self._db.execute(
+                "SELECT user_id, not_before, expires FROM user_not_before WHERE expires >= ?", (time.time(),)
+            ).fetchall()
+
+    # journal de changements partagé entre workers
+
+    def publish(self, kind: str, key: str) -> None:
+        self._outbox.append((kind, key))
+
+    def subscribe(self, kind: str, callback: Callable[[str], None]) -> None:
+        self._subscribers.setdefault(kind, []).append(callback)
+
+    def _on_remote_session(self, session_id: str) -> None:
+        # une modification locale pas encore ecrite est plus recente que celle de l'autre worker
+        if session_id not in self._dirty:
+            self._memory.pop(session_id, None)
+
+    def _load_changes(self) -> List[Tuple[int, str, str]]:
+        with self._db_lock:
+            if self._last_change_id is None:
+                # premier passage: on part de la fin du journal, l'historique ne concerne pas ce processus
+                row = self._db.execute("SELECT COALESCE(MAX(id), 0) FROM changes").fetchone()
+                self._last_change_id = row[0]
+                return []
+            return self._db.execute(
+                "SELECT id, kind, key FROM changes WHERE id > ? AND origin != ? ORDER BY id",
+                (self._last_change_id, self._origin)
+            ).fetchall()
+
+    async def sync_changes(self) -> int:
+        rows = await asyncio.to_thread(self._load_changes)
+        if rows:
+            self._last_change_id = rows[-1][0]
+        for _, kind, key in rows:
+            for callback in self._subscribers.get(kind, ()):
+                try:
+                    callback(key)
+                except Exception:
+                    logger.exception("change subscriber failed for %s %s", kind, key)
+        return len(rows)
+
+    async def flush(self) -> int:
+        if not self._dirty and not self._outbox:
+            return 0
+        dirty, self._dirty = self._dirty, {}
+        outbox, self._outbox = self._outbox, []
+        now = time.time()
+        upserts = [(sid, json.dumps(data), now) for sid, data in dirty.items() if data is not None]
+        deletes = [(sid,) for sid, data in dirty.items() if data is None]
+        changes = [("session", sid, self._origin, now) for sid in dirty]
+        changes.extend((kind, key, self._origin, now) for kind, key in outbox)
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(self._write, upserts, deletes, changes)
+        except Exception:
+            # on remet les sessions en attente sans ecraser les modifications arrivées entre temps
+            for sid, data in dirty.items():
+                self._dirty.setdefault(sid, data)
+            self._outbox[:0] = outbox
+            raise
+        self.metrics.record_flush(len(dirty), time.perf_counter() - started)
+        return len(dirty)
+
+    async def _flush_loop(self) -> None:
+        last_sweep = time.monotonic()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                await self.sync_revoked()
+                await self.sync_changes()
+                if time.monotonic() - last_sweep >= self.sweep_interval:
+                    last_sweep = time.monotonic()
+                    await asyncio.to_thread(self._sweep)
+            except Exception:
+                logger.exception("session store flush failed")
+
+    async def start(self) -> None:
+        tokens.merge_not_before(await asyncio.to_thread(self._load_not_before))
+        await self.sync_revoked()
+        await self.sync_changes()
+        if self._flush_task is None:
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+        with self._db_lock:
+            self._db.close()
+
+    def to_dict(self) -> dict:
+        data = self.metrics.to_dict()
+        data["memory_entries"] = len(self._memory)
+        data["dirty"] = len(self._dirty)
+        data["revoked_tokens"] = tokens.revoked_count()
+        return data
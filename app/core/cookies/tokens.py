@@ -0,0 +1,146 @@
+# session tokens module
+
+# jeton de session autonome: tout ce qu'il faut pour afficher l'entete "connecté" est dans le jeton,
+# donc aucune requete sur users pendant le rendu d'une page
+#
+# format binaire (big endian) puis base64url:  payload.signature
+#   version  B   (2)
+#   user_id  Q
+#   issued   I   (secondes epoch)
+#   expires  I
+#   session  8s  (identifiant aleatoire, sert a la revocation)
+#   role     B   (index dans ROLES)
+#   name     reste du payload en utf-8, tronqué a NAME_MAX_BYTES
+# la signature est un HMAC-SHA256 tronqué a 16 octets
+
+import base64
+import hashlib
+import hmac
+import os
+import struct
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+TOKEN_VERSION = 2
+ROLES = ("customer", "staff", "admin")
+NAME_MAX_BYTES = 64
+SIGNATURE_BYTES = 16
+
+_header = struct.Struct(">BQII8sB")
+
+# identifiants de session revoqués (deconnexion, compte bloqué) -> expiration du jeton
+# une entrée n'a plus d'utilité apres l'expiration du jeton, prune_revoked() la retire.
+# la source partagée entre workers est la table revoked_tokens du SessionStore, ce dict en est la copie locale
+_revoked: Dict[bytes, int] = {}
+
+# revocation par utilisateur (compte supprimé, role changé): user_id -> (not_before, expiration)
+# un jeton de cet utilisateur emis avant not_before est refusé, quel que soit le role qu'il porte.
+# l'entrée ne sert plus quand le dernier jeton emis avant not_before a expiré. source partagée: table
+# user_not_before du SessionStore
+_not_before: Dict[int, Tuple[int, int]] = {}
+
+
+class SessionToken:
+    __slots__ = ("user_id", "name", "role", "issued_at", "expires", "session_id")
+
+    def __init__(self, user_id: int, name: str, role: str, issued_at: int, expires: int, session_id: bytes) -> None:
+        self.user_id = user_id
+        self.name = name
+        self.role = role
+        self.issued_at = issued_at
+        self.expires = expires
+        self.session_id = session_id
+
+    @property
+    def is_revoked(self) -> bool:
+        if self.session_id in _revoked:
+            return True
+        entry = _not_before.get(self.user_id)
+        return entry is not None and self.issued_at < entry[0]
+
+    def is_valid(self, now: Optional[float] = None) -> bool:
+        return self.expires >= (time.time() if now is None else now) and not self.is_revoked
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(secret: bytes, payload: bytes) -> bytes:
+    return hmac.new(secret, payload, hashlib.sha256).digest()[:SIGNATURE_BYTES]
+
+
+def encode_token(secret: bytes, user_id: int, name: str, role: str, max_age: int) -> str:
+    issued_at = int(time.time())
+    role_code = ROLES.index(role) if role in ROLES else 0
+    payload = _header.pack(
+        TOKEN_VERSION, user_id, issued_at, issued_at + max_age, os.urandom(8), role_code
+    ) + (name or "").encode("utf-8")[:NAME_MAX_BYTES]
+    return f"{_b64encode(payload)}.{_b64encode(_sign(secret, payload))}"
+
+
+def decode_token(secrets: Iterable[bytes], token: str) -> Optional[SessionToken]:
+    encoded_payload, _, encoded_signature = token.partition(".")
+    if not encoded_payload or not encoded_signature:
+        return None
+    try:
+        payload = _b64decode(encoded_payload)
+        signature = _b64decode(encoded_signature)
+    except (ValueError, TypeError):
+        return None
+    if len(payload) < _header.size:
+        return None
+
+    for secret in secrets:
+        if hmac.compare_digest(_sign(secret, payload), signature):
+            break
+    else:
+        return None
+
+    version, user_id, issued_at, expires, session_id, role_code = _header.unpack_from(payload)
+    if version != TOKEN_VERSION or role_code >= len(ROLES):
+        return None
+    name = payload[_header.size:].decode("utf-8", errors="ignore")
+    return SessionToken(user_id, name, ROLES[role_code], issued_at, expires, session_id)
+
+
+def revoke(session_id: bytes, expires: int) -> None:
+    _revoked[session_id] = expires
+
+
+def merge_revoked(entries: Iterable[Tuple[bytes, int]]) -> None:
+    _revoked.update(entries)
+
+
+# issued_at est en secondes: un jeton emis dans la seconde de l'invalidation est refusé aussi
+
+def invalidate_user(user_id: int, max_age: int, now: Optional[float] = None) -> Tuple[int, int]:
+    not_before = int(time.time() if now is None else now) + 1
+    merge_not_before([(user_id, not_before, not_before + max_age)])
+    return _not_before[user_id]
+
+
+def merge_not_before(entries: Iterable[Tuple[int, int, int]]) -> None:
+    for user_id, not_before, expires in entries:
+        current = _not_before.get(user_id)
+        if current is None or current[0] < not_before:
+            _not_before[user_id] = (not_before, expires)
+
+
+def prune_revoked(now: Optional[float] = None) -> int:
+    now = time.time() if now is None else now
+    expired = [session_id for session_id, expires in _revoked.items() if expires < now]
+    for session_id in expired:
+        del _revoked[session_id]
+    users = [user_id for user_id, (_, expires) in _not_before.items() if expires < now]
+    for user_id in users:
+        del _not_before[user_id]
+    return len(expired) + len(users)
+
+
+def revoked_count() -> int:
+    return len(_revoked)
@@ -0,0 +1,44 @@
+# exports en flux
+
+# les lignes arrivent des repositories par paquets de taille fixe (curseur cote serveur, session.stream)
+# chaque paquet est encodé en un seul bloc d'octets puis envoyé par StreamingResponse: le paquet suivant
+# n'est lu qu'une fois le precedent envoyé au client, la memoire reste bornée par la taille d'un paquet
+
+import csv
+import io
+from typing import TYPE_CHECKING, Any, AsyncIterator, Sequence
+
+import orjson
+
+if TYPE_CHECKING:
+    from sqlalchemy.engine import Row
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+CSV_MEDIA_TYPE = "text/csv; charset=utf-8"
+
+# un tableur interprete une cellule qui commence par l'un de ces caracteres comme une formule (injection CSV):
+# les noms et emails viennent des utilisateurs, on les prefixe d'une apostrophe pour qu'ils restent du texte
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+async def ndjson_chunks(partitions: AsyncIterator[Sequence["Row"]]) -> AsyncIterator[bytes]:
+    async for rows in partitions:
+        yield b"".join(orjson.dumps(row._asdict()) + b"\n" for row in rows)
+
+
+def _csv_cell(value: Any) -> Any:
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+async def csv_chunks(partitions: AsyncIterator[Sequence["Row"]], columns: Sequence[str]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue().encode("utf-8")
+    async for rows in partitions:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_csv_cell(value) for value in row] for row in rows)
+        yield buffer.getvalue().encode("utf-8")
@@ -0,0 +1,108 @@
+# authentication middleware
+
+# le cookie (ou le jeton bearer) est decodé une seule fois par requete
+# le resultat est rangé dans request.state pour les endpoints et les view models
+
+import logging
+from typing import TYPE_CHECKING, Callable, Optional
+
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.bd import instrumentation
+from app.core.cookies import cookie_auth
+from app.user.cache import UserCache
+
+if TYPE_CHECKING:
+    from app.bd.unit_of_work import RequestSessionScope
+
+
+# les middlewares recoivent des fournisseurs (providers du conteneur) et non les objets eux memes:
+# les objets sont créés a la premiere requete, pas a l'import de main
+
+class AuthenticationMiddleware:
+    def __init__(self, app: ASGIApp, user_cache: Optional[Callable[[], UserCache]] = None) -> None:
+        self.app = app
+        self.user_cache_provider = user_cache
+        self.user_cache: Optional[UserCache] = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        session = cookie_auth.authenticate(HTTPConnection(scope))
+        user_id = session.user_id if session is not None else None
+        state = scope.setdefault("state", {})
+        state["session"] = session
+        state["user_id"] = user_id
+        state["user"] = None
+        if self.user_cache is None and self.user_cache_provider is not None:
+            self.user_cache = self.user_cache_provider()
+        if user_id is not None and self.user_cache is not None:
+            state["user"] = self.user_cache.get_by_id(user_id)
+
+        await self.app(scope, receive, send)
+
+
+# resumé des requetes SQL de chaque requete HTTP: entete Server-Timing et alerte en cas de N+1
+
+class QueryStatsMiddleware:
+    def __init__(self, app: ASGIApp, n_plus_one_threshold: int = 10) -> None:
+        self.app = app
+        self.n_plus_one_threshold = int(n_plus_one_threshold)
+        self.logger = logging.getLogger(__name__)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = instrumentation.start_request()
+        stats = instrumentation.current_request_stats()
+
+        async def send_with_summary(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", f'db;dur={stats.total_ms:.2f};desc="{stats.count} queries"')
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_summary)
+        finally:
+            instrumentation.end_request(token)
+            summary = stats.summary(self.n_plus_one_threshold)
+            scope.setdefault("state", {})["query_summary"] = summary
+            if summary["n_plus_one"]:
+                self.logger.warning("possible N+1 on %s %s: %s", scope["method"], scope["path"], summary["n_plus_one"])
+
+
+# une seule session de base de donnees par requete HTTP (voir app/bd/unit_of_work.py)
+# le nombre de sorties de connexion de la requete est renvoyé dans l'entete X-DB-Checkouts
+
+class UnitOfWorkMiddleware:
+    def __init__(self, app: ASGIApp, session_scope: Optional[Callable[[], "RequestSessionScope"]] = None) -> None:
+        self.app = app
+        self.session_scope_provider = session_scope
+        self.session_scope: "Optional[RequestSessionScope]" = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if self.session_scope is None and self.session_scope_provider is not None:
+            self.session_scope = self.session_scope_provider()
+        if self.session_scope is None:
+            await self.app(scope, receive, send)
+            return
+
+        async with self.session_scope.begin() as unit_of_work:
+
+            async def send_with_checkouts(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    MutableHeaders(scope=message).append("X-DB-Checkouts", str(unit_of_work.checkouts))
+                await send(message)
+
+            await self.app(scope, receive, send_with_checkouts)
+            scope.setdefault("state", {})["unit_of_work"] = unit_of_work.to_dict()
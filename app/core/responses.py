@@ -0,0 +1,40 @@
+# reponses JSON
+
+# ORJSONResponse est la classe de reponse par defaut de l'application (voir main.py)
+# pour les modeles pydantic, ModelResponse serialise directement en bytes avec le serializer
+# pydantic-core du TypeAdapter, sans passer par jsonable_encoder ni par un dict intermediaire
+
+from functools import lru_cache
+from typing import Any, Mapping, Optional
+
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
+from starlette.background import BackgroundTask
+
+
+# un TypeAdapter par type: le schema et le serializer sont construits une seule fois par processus
+
+@lru_cache(maxsize=None)
+def type_adapter(tp: Any) -> TypeAdapter:
+    return TypeAdapter(tp)
+
+
+def dump_json(content: Any, tp: Optional[Any] = None) -> bytes:
+    return type_adapter(tp if tp is not None else type(content)).dump_json(content)
+
+
+class ModelResponse(ORJSONResponse):
+    def __init__(
+        self,
+        content: Any,
+        model: Optional[Any] = None,
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+        background: Optional[BackgroundTask] = None
+    ) -> None:
+        # render() est appelé par le constructeur de Response, le type doit etre connu avant
+        self.model = model
+        super().__init__(content, status_code=status_code, headers=headers, background=background)
+
+    def render(self, content: Any) -> bytes:
+        return dump_json(content, self.model)
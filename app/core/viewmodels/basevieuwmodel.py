@@ -4,7 +4,7 @@ from typing import Optional
 
 from starlette.requests import Request
 
-from app.core.cookies.cookie_auth import get_user_id_via_cookie
+from app.core.cookies.cookie_auth import get_session
 
 
 class ViewModelBase:
@@ -12,7 +12,12 @@ class ViewModelBase:
     def __init__(self,request:Request) -> None:
         self.request:Request = request
         self.error: Optional[str] = None
-        self.user_id :Optional[int] = get_user_id_via_cookie(self.request)
+        # l'entete "connecté" (nom, role) se construit depuis le jeton, sans requete sur users
+        session = get_session(self.request)
+        self.user_id :Optional[int] = session.user_id if session else None
+        self.user_name :Optional[str] = session.name if session else None
+        self.user_role :Optional[str] = session.role if session else None
+        self.user = getattr(self.request.state, "user", None)
         
     def to_dict(self) -> dict:
         return self.__dict__
\ No newline at end of file
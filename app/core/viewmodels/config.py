@@ -1,5 +1,33 @@
 import os
+import secrets
 
 # configuration 
 
-AUTH_COOKIE_NAME = os.environ.get("AUTH_COOKIE_NAME", "pizza_delivry")
\ No newline at end of file
+AUTH_COOKIE_NAME = os.environ.get("AUTH_COOKIE_NAME", "pizza_delivry")
+
+# fichier de configuration lu par le lanceur (serveur, calibration bcrypt) et par main.create_app (workers)
+APP_CONFIG = os.environ.get("APP_CONFIG", "config.yml")
+
+# APP_DEV=1 autorise le demarrage sans clé configurée (developpement local uniquement)
+APP_DEV = os.environ.get("APP_DEV") == "1"
+
+# la premiere clé signe les nouveaux cookies, les suivantes sont encore acceptées pendant une rotation
+# pas de valeur par defaut: le jeton porte le role, une clé connue permettrait de se fabriquer un cookie admin
+AUTH_COOKIE_SECRETS = [
+    secret.strip()
+    for secret in os.environ.get("AUTH_COOKIE_SECRETS", "").split(",")
+    if secret.strip()
+]
+if not AUTH_COOKIE_SECRETS and APP_DEV:
+    # clé aleatoire propre au processus: les cookies ne survivent pas a un redemarrage
+    AUTH_COOKIE_SECRETS = [secrets.token_urlsafe(32)]
+AUTH_COOKIE_MAX_AGE = int(os.environ.get("AUTH_COOKIE_MAX_AGE", 60 * 60 * 24 * 14))
+AUTH_COOKIE_CACHE_SIZE = int(os.environ.get("AUTH_COOKIE_CACHE_SIZE", 4096))
+
+SESSION_COOKIE_NAME = os.environ.get("SESSION_COOKIE_NAME", "pizza_delivry_session")
+
+
+def check_auth_secrets() -> None:
+    # appelée au demarrage (lanceur et lifespan): on refuse de servir sans clé de signature
+    if not AUTH_COOKIE_SECRETS:
+        raise RuntimeError("AUTH_COOKIE_SECRETS is not set (use APP_DEV=1 for local development only)")
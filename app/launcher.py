@@ -0,0 +1,306 @@
+# lanceur de production
+#
+#   python -m app.launcher                 (seul point d'entrée, "python main.py" y est renvoyé)
+#   APP_CONFIG=prod.yml python -m app.launcher
+#   kill -HUP <pid du maitre>              redemarrage progressif des workers
+#   kill -TERM <pid du maitre>             arret propre
+#
+# le maitre importe et prechauffe l'application une seule fois (imports, requetes chaudes, schema openapi)
+# puis fork N workers qui partagent la socket ouverte par le maitre. une socket par worker (SO_REUSEPORT)
+# perdrait les connexions en attente dans la file d'un worker qui s'arrete: avec la socket partagée elles
+# restent dans la file commune et sont acceptées par les autres. reuse_port pose seulement SO_REUSEPORT
+# sur cette socket (un second lanceur peut ecouter le meme port pendant une mise a jour).
+# un worker qui ne redemarre pas est retenté avec un delai croissant, sa place n'est jamais perdue.
+# sans cout bcrypt fixé, le maitre calibre bcrypt avant le fork et enregistre le resultat: tous les workers
+# utilisent le meme cout (voir app/auth/hashing.py).
+# les connexions a la base ne sont jamais ouvertes avant le fork: chaque worker chauffe son propre pool
+# au demarrage (lifespan). au SIGHUP chaque worker est remplacé un par un: le nouveau doit etre pret
+# avant que l'ancien recoive SIGTERM, et uvicorn laisse l'ancien finir ses requetes en cours.
+
+import importlib
+import logging
+import os
+import select
+import signal
+import socket
+import sys
+import time
+from typing import Dict, Optional, Tuple
+
+import yaml
+
+logger = logging.getLogger("app.launcher")
+
+
+def load_server_config(path: str = "config.yml") -> dict:
+    with open(path, encoding="utf-8") as fh:
+        config = yaml.safe_load(fh)["services"]["app"]
+    server = {
+        "host": "127.0.0.1",
+        "port": 8000,
+        "workers": os.cpu_count() or 1,
+        "reuse_port": True,
+        "backlog": 2048,
+        "graceful_timeout": 30,
+        "ready_timeout": 30,
+    }
+    server.update(config.get("server") or {})
+    return server
+
+
+def calibrate_hashing(path: str = "config.yml") -> Optional[int]:
+    from app.auth.hashing import load_or_calibrate
+
+    with open(path, encoding="utf-8") as fh:
+        hashing = yaml.safe_load(fh)["services"]["app"].get("hashing") or {}
+    if hashing.get("rounds"):
+        return int(hashing["rounds"])
+    if not hashing.get("latency_budget_ms"):
+        return None
+    started = time.perf_counter()
+    rounds = load_or_calibrate(
+        hashing.get("calibration_path"),
+        float(hashing["latency_budget_ms"]),
+        int(hashing.get("min_rounds", 10)),
+        int(hashing.get("max_rounds", 15))
+    )
+    logger.info("bcrypt cost %s rounds resolved in %.0f ms", rounds, (time.perf_counter() - started) * 1000)
+    return rounds
+
+
+def _has_module(name: str) -> bool:
+    try:
+        __import__(name)
+    except ImportError:
+        return False
+    return True
+
+
+def preload():
+    started = time.perf_counter()
+    from main import app as asgi_app
+    # requetes chaudes construites une fois dans le maitre, partagées par fork
+    importlib.import_module("app.user.queries")
+
+    asgi_app.openapi()
+    logger.info("application preloaded in %.0f ms", (time.perf_counter() - started) * 1000)
+    return asgi_app
+
+
+def bind_socket(host: str, port: int, reuse_port: bool, backlog: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Launcher:
+    def __init__(self, app, server: dict) -> None:
+        self.app = app
+        self.server = server
+        self.workers: Dict[int, int] = {}            # pid -> numero du worker
+        self.missing: Dict[int, Tuple[float, float]] = {}  # numero -> (prochain essai, delai)
+        self.reuse_port = bool(server["reuse_port"]) and hasattr(socket, "SO_REUSEPORT")
+        self.shared_socket: Optional[socket.socket] = None
+        self.stopping = False
+        self.reload_requested = False
+        self.loop_impl = "uvloop" if _has_module("uvloop") else "asyncio"
+        self.http_impl = "httptools" if _has_module("httptools") else "h11"
+
+    # --- cote worker ---
+
+    def _run_worker(self, ready_fd: int) -> None:
+        import uvicorn
+
+        sock = self.shared_socket
+        config = uvicorn.Config(
+            self.app,
+            loop=self.loop_impl,
+            http=self.http_impl,
+            lifespan="on",
+            backlog=self.server["backlog"],
+            timeout_graceful_shutdown=self.server["graceful_timeout"],
+        )
+
+        class WorkerServer(uvicorn.Server):
+            async def startup(self, sockets=None) -> None:
+                await super().startup(sockets=sockets)
+                # le maitre attend cet octet avant d'arreter l'ancien worker lors d'un redemarrage progressif
+                if not self.should_exit:
+                    os.write(ready_fd, b"1")
+                os.close(ready_fd)
+
+        WorkerServer(config).run(sockets=[sock])
+
+    # --- cote maitre ---
+
+    def spawn(self, number: int) -> Optional[int]:
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+                signal.signal(sig, signal.SIG_DFL)
+            code = 0
+            try:
+                self._run_worker(write_fd)
+            except BaseException:
+                logger.exception("worker %s crashed", number)
+                code = 1
+            os._exit(code)
+
+        os.close(write_fd)
+        self.workers[pid] = number
+        ready = self._wait_ready(read_fd)
+        os.close(read_fd)
+        if not ready:
+            # le worker n'a jamais servi: on le tue et on le recolte ici pour que _reap ne le relance pas
+            logger.error("worker %s (pid %s) did not become ready", number, pid)
+            self.workers.pop(pid, None)
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+            return None
+        logger.info("worker %s ready (pid %s)", number, pid)
+        return pid
+
+    def _wait_ready(self, read_fd: int) -> bool:
+        deadline = time.monotonic() + self.server["ready_timeout"]
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            try:
+                readable, _, _ = select.select([read_fd], [], [], remaining)
+            except InterruptedError:
+                continue
+            if readable:
+                return os.read(read_fd, 1) == b"1"
+
+    def _terminate(self, pid: int) -> None:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def _reap(self, block: bool = False) -> None:
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, 0 if block else os.WNOHANG)
+            except ChildProcessError:
+                self.workers.clear()
+                return
+            if pid == 0:
+                return
+            number = self.workers.pop(pid, None)
+            if number is not None and not self.stopping and not self.reload_requested:
+                logger.warning("worker %s (pid %s) exited with status %s, respawning", number, pid, status)
+                self._respawn(number)
+            if block:
+                return
+
+    def _respawn(self, number: int) -> None:
+        if self.spawn(number) is not None:
+            self.missing.pop(number, None)
+            return
+        _, delay = self.missing.get(number, (0.0, 0.5))
+        logger.error("worker %s failed to start, retrying in %.1f s", number, delay)
+        self.missing[number] = (time.monotonic() + delay, min(delay * 2, 30.0))
+
+    def _retry_missing(self) -> None:
+        now = time.monotonic()
+        for number, (retry_at, _) in list(self.missing.items()):
+            if self.stopping:
+                return
+            if retry_at <= now:
+                self._respawn(number)
+
+    def rolling_restart(self) -> None:
+        for old_pid, number in list(self.workers.items()):
+            if self.stopping:
+                return
+            new_pid = self.spawn(number)
+            if new_pid is None:
+                logger.error("rolling restart aborted, keeping worker %s (pid %s)", number, old_pid)
+                return
+            self.workers.pop(old_pid, None)
+            self._terminate(old_pid)
+            try:
+                os.waitpid(old_pid, 0)
+            except ChildProcessError:
+                pass
+
+    def stop(self) -> None:
+        self.stopping = True
+        for pid in list(self.workers):
+            self._terminate(pid)
+        deadline = time.monotonic() + self.server["graceful_timeout"] + 5
+        while self.workers and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in list(self.workers):
+            logger.warning("killing worker pid %s after graceful timeout", pid)
+            os.kill(pid, signal.SIGKILL)
+        self._reap()
+
+    def run(self) -> None:
+        self.shared_socket = bind_socket(
+            self.server["host"], self.server["port"], self.reuse_port, self.server["backlog"]
+        )
+        logger.info(
+            "starting %s workers on %s:%s (loop=%s, http=%s, reuse_port=%s)",
+            self.server["workers"], self.server["host"], self.server["port"],
+            self.loop_impl, self.http_impl, self.reuse_port
+        )
+        for number in range(int(self.server["workers"])):
+            self._respawn(number)
+
+        def on_signal(sig, frame) -> None:
+            if sig == signal.SIGHUP:
+                self.reload_requested = True
+            else:
+                self.stopping = True
+
+        signal.signal(signal.SIGHUP, on_signal)
+        signal.signal(signal.SIGTERM, on_signal)
+        signal.signal(signal.SIGINT, on_signal)
+
+        while not self.stopping:
+            if self.reload_requested:
+                logger.info("rolling restart of %s workers", len(self.workers))
+                self.rolling_restart()
+                self.reload_requested = False
+            self._reap()
+            self._retry_missing()
+            time.sleep(0.2)
+        self.stop()
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    from app.core.viewmodels.config import APP_CONFIG, check_auth_secrets
+
+    # on echoue dans le maitre, avant de forker des workers qui refuseraient tous de demarrer
+    check_auth_secrets()
+    # le meme chemin que main.create_app: les workers ont la meme base et le meme cout bcrypt que le maitre
+    config_path = APP_CONFIG
+    server = load_server_config(config_path)
+    calibrate_hashing(config_path)
+    app = preload()
+    if not hasattr(os, "fork"):
+        # pas de fork (Windows): un seul processus uvicorn
+        import uvicorn
+        uvicorn.run(app, host=server["host"], port=server["port"], timeout_graceful_shutdown=server["graceful_timeout"])
+        return
+    Launcher(app, server).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
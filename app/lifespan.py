@@ -0,0 +1,104 @@
+# lifespan de l'application
+
+# demarrage: schema, pool de connexions, ecrivain, pool de hash, requetes chaudes, store de sessions,
+# puis verifications de disponibilité avant d'accepter du trafic. chaque etape est chronometrée.
+# arret: on vide les files (sessions modifiées, ecritures en attente) puis on ferme les moteurs et le pool de hash
+
+import asyncio
+import logging
+import time
+from contextlib import AsyncExitStack, asynccontextmanager, contextmanager
+from typing import AsyncIterator, Awaitable, Callable, List, Tuple
+
+from fastapi import FastAPI
+
+from app.containers import Containers
+from app.core.viewmodels import config as app_config
+
+logger = logging.getLogger(__name__)
+
+
+class StartupReport:
+    def __init__(self) -> None:
+        self.stages: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, (time.perf_counter() - started) * 1000))
+
+    @property
+    def total_ms(self) -> float:
+        return sum(elapsed for _, elapsed in self.stages)
+
+    def to_dict(self) -> dict:
+        return {"total_ms": self.total_ms, "stages": {name: elapsed for name, elapsed in self.stages}}
+
+    def __str__(self) -> str:
+        lines = [f"  {name:<16} {elapsed:8.1f} ms" for name, elapsed in self.stages]
+        lines.append(f"  {'total':<16} {self.total_ms:8.1f} ms")
+        return "startup report:\n" + "\n".join(lines)
+
+
+# chaque ressource enregistre son arret des sa creation: si une etape du demarrage echoue, ce qui a deja
+# été demarré est quand meme libéré. les arrets sont isolés: une erreur est journalisée et les suivants passent
+
+def _isolated(name: str, teardown: Callable[[], Awaitable[None]]) -> Callable[[], Awaitable[None]]:
+    async def run() -> None:
+        try:
+            await teardown()
+        except Exception:
+            logger.exception("shutdown step %s failed", name)
+    return run
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    app_config.check_auth_secrets()
+    # importés ici et pas en tete: ils tirent sqlalchemy, absent de "import main"
+    # l'import des modeles enregistre aussi leurs tables sur Base.metadata avant l'etape "schema"
+    from app.user import queries as user_queries
+
+    container: Containers = app.container
+    report = StartupReport()
+
+    async with AsyncExitStack() as stack:
+        started = time.perf_counter()
+        stack.callback(lambda: logger.info("shutdown completed in %.1f ms", (time.perf_counter() - started) * 1000))
+
+        # la pile s'execute a l'envers: le hash, puis les moteurs, puis le store de sessions (dernier flush)
+        bd = container.bd()
+        session_store = container.session_store()
+        stack.push_async_callback(_isolated("session_store", session_store.stop))
+        stack.push_async_callback(_isolated("database", bd.dispose))
+
+        with report.stage("schema"):
+            await bd.create_database()
+        with report.stage("db_pool"):
+            await bd.warm_up()
+        with report.stage("hot_queries"):
+            # le cache de compilation est propre a chaque moteur: une passe par shard
+            async def warm_up_shard(shard: int) -> None:
+                async with bd.read_session(shard) as session:
+                    await user_queries.warm_up(session)
+
+            await bd.scatter_gather(warm_up_shard)
+        with report.stage("hashing"):
+            password_hasher = container.password_hasher()
+            stack.push_async_callback(_isolated("hashing", lambda: asyncio.to_thread(password_hasher.shutdown)))
+            await password_hasher.warm_up()
+        with report.stage("session_store"):
+            # les invalidations du cache d'utilisateurs passent aux autres workers par le journal du store
+            container.user_cache().share_through(session_store)
+            await session_store.start()
+        with report.stage("readiness"):
+            await bd.ping()
+
+        app.state.startup_report = report.to_dict()
+        logger.info("%s", report)
+
+        yield
+        started = time.perf_counter()
@@ -0,0 +1,46 @@
+# monitoring endpoint
+
+from typing import TYPE_CHECKING
+
+from dependency_injector.wiring import inject, Provide
+from fastapi import (
+    APIRouter,
+    Depends
+)
+from fastapi.responses import ORJSONResponse
+
+from app.auth.hashing import PasswordHasher
+from app.auth.singleflight import SingleFlight
+from app.containers import Containers
+from app.core.cookies.cookie_auth import require_admin
+from app.core.cookies.session_store import SessionStore
+from app.user.cache import UserCache
+
+if TYPE_CHECKING:
+    from app.bd.sharding import ShardedDatabase
+    from app.user.loaders import UserLoader
+
+monitoring = APIRouter(tags=["Monitoring"])
+
+
+# les metriques contiennent le SQL normalisé des requetes: reservées aux administrateurs
+
+@monitoring.get("/metrics", dependencies=[Depends(require_admin)])
+@inject
+async def metrics(
+    bd: "ShardedDatabase" = Depends(Provide[Containers.bd]),
+    password_hasher: PasswordHasher = Depends(Provide[Containers.password_hasher]),
+    login_flights: SingleFlight = Depends(Provide[Containers.login_flights]),
+    user_loader: "UserLoader" = Depends(Provide[Containers.user_loader]),
+    user_cache: UserCache = Depends(Provide[Containers.user_cache]),
+    session_store: SessionStore = Depends(Provide[Containers.session_store])
+) -> ORJSONResponse:
+    return ORJSONResponse({
+        "queries": bd.monitor.to_dict(),
+        "pool": bd.pool_status(),
+        "hashing": password_hasher.metrics.to_dict(),
+        "login_flights": login_flights.to_dict(),
+        "user_loader": user_loader.to_dict(),
+        "user_cache": user_cache.to_dict(),
+        "sessions": session_store.to_dict(),
+    })
@@ -0,0 +1,144 @@
+# user cache module
+
+# chaque requete authentifiée a besoin de l'utilisateur derriere l'id du cookie
+# on garde en memoire une copie legere de la ligne users, indexée par id et par email normalisé
+
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    from app.user.models import User
+
+
+class UserSnapshot:
+    __slots__ = ("id", "email", "name", "hash_password", "created_date", "role")
+
+    def __init__(self, id: int, email: str, name: str, hash_password: str, created_date: Optional[datetime], role: str = "customer") -> None:
+        self.id = id
+        self.email = email
+        self.name = name
+        self.hash_password = hash_password
+        self.created_date = created_date
+        self.role = role
+
+    @classmethod
+    def from_user(cls, user: "User") -> "UserSnapshot":
+        return cls(user.id, user.email, user.name, user.hash_password, user.created_date, user.role)
+
+    def __repr__(self) -> str:
+        return f"UserSnapshot(id={self.id!r}, email={self.email!r})"
+
+
+def normalize_email(email: str) -> str:
+    return email.lower().strip()
+
+
+class UserCache:
+    def __init__(self, max_size: int = 10000, ttl: float = 300.0) -> None:
+        self.max_size = int(max_size)
+        self.ttl = float(ttl)
+        self._by_id: "OrderedDict[int, Tuple[UserSnapshot, float]]" = OrderedDict()
+        self._id_by_email: Dict[str, int] = {}
+        self._generation = 0
+        # appelé a chaque invalidation locale pour la propager aux autres workers (voir app/lifespan.py)
+        self.on_invalidate: Optional[Callable[[Optional[int], Optional[str]], None]] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.stale_fills = 0
+
+    # une lecture en base prend la generation avant de commencer et la repasse a put():
+    # si une invalidation est arrivée entre temps la ligne lue est peut etre perimée, on ne la garde pas
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get_by_id(self, user_id: int) -> Optional[UserSnapshot]:
+        entry = self._by_id.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        snapshot, expires_at = entry
+        if expires_at < time.monotonic():
+            self.expirations += 1
+            self.misses += 1
+            self._remove(user_id)
+            return None
+        self._by_id.move_to_end(user_id)
+        self.hits += 1
+        return snapshot
+
+    def get_by_email(self, email: str) -> Optional[UserSnapshot]:
+        user_id = self._id_by_email.get(normalize_email(email))
+        if user_id is None:
+            self.misses += 1
+            return None
+        return self.get_by_id(user_id)
+
+    def put(self, snapshot: UserSnapshot, generation: Optional[int] = None) -> None:
+        if generation is not None and generation != self._generation:
+            self.stale_fills += 1
+            return
+        self._remove(snapshot.id)
+        self._by_id[snapshot.id] = (snapshot, time.monotonic() + self.ttl)
+        self._id_by_email[normalize_email(snapshot.email)] = snapshot.id
+        while len(self._by_id) > self.max_size:
+            oldest_id = next(iter(self._by_id))
+            self._remove(oldest_id)
+            self.evictions += 1
+
+    # appelée par les chemins d'ecriture (mise a jour, suppression, nouveau hash) avant de rendre la main
+
+    def invalidate(self, user_id: Optional[int] = None, email: Optional[str] = None, propagate: bool = True) -> None:
+        self._generation += 1
+        if propagate and self.on_invalidate is not None:
+            self.on_invalidate(user_id, email)
+        if email is not None:
+            user_id_by_email = self._id_by_email.pop(normalize_email(email), None)
+            if user_id is None:
+                user_id = user_id_by_email
+        if user_id is not None and self._remove(user_id):
+            self.invalidations += 1
+
+    # feed: le journal de changements du SessionStore (publish/subscribe), partagé par tous les workers
+
+    def share_through(self, feed) -> None:
+        self.on_invalidate = lambda user_id, email: feed.publish("user", json.dumps([user_id, email]))
+        feed.subscribe("user", lambda key: self.invalidate(*json.loads(key), propagate=False))
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._by_id.clear()
+        self._id_by_email.clear()
+
+    def _remove(self, user_id: int) -> bool:
+        entry = self._by_id.pop(user_id, None)
+        if entry is None:
+            return False
+        email = normalize_email(entry[0].email)
+        if self._id_by_email.get(email) == user_id:
+            del self._id_by_email[email]
+        return True
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def to_dict(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._by_id),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "stale_fills": self.stale_fills,
+        }
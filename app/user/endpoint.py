@@ -0,0 +1,61 @@
+# user endpoint
+
+from typing import Optional
+
+from dependency_injector.wiring import inject, Provide
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    status
+)
+from fastapi.responses import StreamingResponse
+
+from app.containers import Containers
+from app.core.cookies.cookie_auth import require_admin
+from app.core.exports import CSV_MEDIA_TYPE, NDJSON_MEDIA_TYPE
+from app.core.responses import ModelResponse
+from app.user.schemas import UserPage
+from app.user.services import InvalidCursorError, UserServices
+
+users = APIRouter(tags=["Users"])
+
+
+@users.get("/admin/users", response_model=UserPage, dependencies=[Depends(require_admin)])
+@inject
+async def list_users(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    email_prefix: Optional[str] = None,
+    user_services: UserServices = Depends(Provide[Containers.user_services])
+):
+    try:
+        page = await user_services.list_users(limit, cursor, email_prefix)
+    except InvalidCursorError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="invalid cursor")
+    return ModelResponse(page)
+
+
+@users.get("/admin/users/export.ndjson", dependencies=[Depends(require_admin)])
+@inject
+async def export_users_ndjson(
+    user_services: UserServices = Depends(Provide[Containers.user_services])
+):
+    return StreamingResponse(
+        user_services.export_users_ndjson(),
+        media_type=NDJSON_MEDIA_TYPE,
+        headers={"Content-Disposition": 'attachment; filename="users.ndjson"'}
+    )
+
+
+@users.get("/admin/users/export.csv", dependencies=[Depends(require_admin)])
+@inject
+async def export_users_csv(
+    user_services: UserServices = Depends(Provide[Containers.user_services])
+):
+    return StreamingResponse(
+        user_services.export_users_csv(),
+        media_type=CSV_MEDIA_TYPE,
+        headers={"Content-Disposition": 'attachment; filename="users.csv"'}
+    )
@@ -0,0 +1,120 @@
+# user loaders module
+
+# beaucoup de coroutines cherchent des utilisateurs differents pendant le meme tour de boucle
+# on regroupe les clés demandées pendant un tour et on les resout avec une seule requete IN (...) par shard
+# par id: le shard id % N. par email: le shard de l'email d'abord, puis les autres pour les emails manquants
+
+import asyncio
+import contextvars
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set
+
+from app.bd.hot_queries import hot_queries
+from app.bd.sharding import ShardedDatabase
+from app.user.cache import UserSnapshot
+from app.user.queries import USERS_BY_EMAILS, USERS_BY_IDS
+
+
+class BatchLoader:
+    def __init__(self, fetch: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]], max_batch_size: int = 500) -> None:
+        self._fetch = fetch
+        self.max_batch_size = max_batch_size
+        self._pending: Dict[Hashable, asyncio.Future] = {}
+        self._scheduled = False
+        self._tasks: Set[asyncio.Task] = set()
+        self.loads = 0
+        self.batches = 0
+
+    async def load(self, key: Hashable) -> Any:
+        self.loads += 1
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending[key] = future
+            if not self._scheduled:
+                # le lot part au tour de boucle suivant, apres que toutes les coroutines prêtes aient demandé leur clé
+                self._scheduled = True
+                loop.call_soon(self._dispatch)
+        return await asyncio.shield(future)
+
+    def _dispatch(self) -> None:
+        pending, self._pending = self._pending, {}
+        self._scheduled = False
+        keys = list(pending)
+        for start in range(0, len(keys), self.max_batch_size):
+            chunk = {key: pending[key] for key in keys[start:start + self.max_batch_size]}
+            # un contexte vide: le lot sert plusieurs requetes, ses requetes SQL ne sont comptées
+            # ni dans les statistiques ni dans l'unité de travail de la premiere
+            task = asyncio.get_running_loop().create_task(self._resolve(chunk), context=contextvars.Context())
+            # la boucle ne garde qu'une reference faible vers les taches
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _resolve(self, futures: Dict[Hashable, asyncio.Future]) -> None:
+        self.batches += 1
+        try:
+            found = await self._fetch(list(futures))
+        except Exception as err:
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(err)
+                    # la meme exception peut ne pas etre relue si l'appelant a été annulé
+                    future.exception()
+            return
+        for key, future in futures.items():
+            if not future.done():
+                future.set_result(found.get(key))
+
+    def to_dict(self) -> dict:
+        return {"loads": self.loads, "batches": self.batches}
+
+
+class UserLoader:
+    def __init__(self, database: ShardedDatabase, max_batch_size: int = 500) -> None:
+        self.database = database
+        self.by_email = BatchLoader(self._fetch_by_email, max_batch_size)
+        self.by_id = BatchLoader(self._fetch_by_id, max_batch_size)
+
+    async def load_by_email(self, email: str) -> Optional[UserSnapshot]:
+        return await self.by_email.load(email.lower().strip())
+
+    async def load_by_id(self, user_id: int) -> Optional[UserSnapshot]:
+        return await self.by_id.load(int(user_id))
+
+    async def _fetch_by_email(self, emails: List[str]) -> Dict[str, UserSnapshot]:
+        found = await self._fetch(USERS_BY_EMAILS, "emails", {
+            shard: [email for email in emails if self.database.shard_for_email(email) == shard]
+            for shard in range(self.database.shard_count)
+        })
+        by_email = {user.email: user for user in found}
+        missing = [email for email in emails if email not in by_email]
+        if missing and self.database.shard_count > 1:
+            others = await self._fetch(USERS_BY_EMAILS, "emails", {
+                shard: [email for email in missing if self.database.shard_for_email(email) != shard]
+                for shard in range(self.database.shard_count)
+            })
+            by_email.update((user.email, user) for user in others)
+        return by_email
+
+    async def _fetch_by_id(self, user_ids: List[int]) -> Dict[int, UserSnapshot]:
+        found = await self._fetch(USERS_BY_IDS, "user_ids", {
+            shard: [user_id for user_id in user_ids if self.database.shard_for_id(user_id) == shard]
+            for shard in range(self.database.shard_count)
+        })
+        return {user.id: user for user in found}
+
+    # une requete IN par shard qui a des clés, les shards sont lus en parallele
+
+    async def _fetch(self, name: str, param: str, keys_by_shard: Dict[int, List[Hashable]]) -> List[UserSnapshot]:
+        async def fetch_shard(shard: int) -> List[UserSnapshot]:
+            keys = keys_by_shard.get(shard)
+            if not keys:
+                return []
+            async with self.database.read_session(shard) as session:
+                return await hot_queries.all(session, name, **{param: keys})
+
+        results = await self.database.scatter_gather(fetch_shard)
+        return [user for users in results for user in users]
+
+    def to_dict(self) -> dict:
+        return {"by_email": self.by_email.to_dict(), "by_id": self.by_id.to_dict()}
@@ -5,7 +5,8 @@ from sqlalchemy import(
     Column,
     String,
     Integer,
-    DateTime
+    DateTime,
+    func
 )
 
 from app.bd.database import Base
@@ -16,5 +17,8 @@ class User(Base):
     email = Column(String, unique=True, index=True, nullable=False)
     name = Column(String, nullable=False)
     hash_password = Column(String, nullable=False)
-    created_date: datetime = Column(DateTime, default=datetime.now, index=True)
+    role = Column(String, nullable=False, default="customer", server_default="customer")
+    created_date: datetime = Column(
+        DateTime, nullable=False, default=datetime.now, server_default=func.current_timestamp(), index=True
+    )
     
\ No newline at end of file
@@ -0,0 +1,48 @@
+# user hot queries
+
+# requetes chaudes de la table users, enregistrées une fois dans le registre hot_queries
+# les colonnes sont dans l'ordre du constructeur de UserSnapshot
+
+from sqlalchemy import bindparam
+from sqlalchemy.future import select
+
+from app.bd.hot_queries import hot_queries
+from app.user.cache import UserSnapshot
+from app.user.models import User
+
+_snapshot_columns = (User.id, User.email, User.name, User.hash_password, User.created_date, User.role)
+
+USER_BY_EMAIL = "user_by_email"
+USER_BY_ID = "user_by_id"
+USERS_BY_EMAILS = "users_by_emails"
+USERS_BY_IDS = "users_by_ids"
+
+hot_queries.register(
+    USER_BY_EMAIL,
+    select(*_snapshot_columns).where(User.email == bindparam("email")),
+    UserSnapshot
+)
+hot_queries.register(
+    USER_BY_ID,
+    select(*_snapshot_columns).where(User.id == bindparam("user_id")),
+    UserSnapshot
+)
+hot_queries.register(
+    USERS_BY_EMAILS,
+    select(*_snapshot_columns).where(User.email.in_(bindparam("emails", expanding=True))),
+    UserSnapshot
+)
+hot_queries.register(
+    USERS_BY_IDS,
+    select(*_snapshot_columns).where(User.id.in_(bindparam("user_ids", expanding=True))),
+    UserSnapshot
+)
+
+
+# une execution de chaque requete chaude au demarrage remplit le cache de compilation de SQLAlchemy
+
+async def warm_up(session) -> None:
+    await hot_queries.one_or_none(session, USER_BY_EMAIL, email="")
+    await hot_queries.one_or_none(session, USER_BY_ID, user_id=0)
+    await hot_queries.all(session, USERS_BY_EMAILS, emails=[""])
+    await hot_queries.all(session, USERS_BY_IDS, user_ids=[0])
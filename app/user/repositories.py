@@ -0,0 +1,166 @@
+# repositories user module
+
+# les ecritures sur la table users invalident le cache d'utilisateurs pour ne jamais servir une ligne perimée
+# supprimer un compte ou changer son role invalide aussi les jetons deja emis (le role est lu dans le jeton)
+# chaque ligne vit sur le shard id % N (voir app/bd/sharding.py): lectures et ecritures par id ne touchent qu'un shard
+
+import heapq
+from contextlib import AbstractAsyncContextManager
+from datetime import datetime
+from itertools import islice
+from typing import TYPE_CHECKING, AsyncIterator, Callable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, tuple_, update
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.bd.sharding import ShardedDatabase
+from app.core.cookies.tokens import ROLES
+from app.user.cache import UserCache
+from app.user.models import User
+from app.user.schemas import UserEdit
+
+if TYPE_CHECKING:
+    from app.core.cookies.session_store import SessionStore
+    from app.user.loaders import UserLoader
+
+
+class DuplicateEmailError(ValueError):
+    pass
+
+
+# l'index unique sur l'email ne couvre qu'un fichier: avant d'ecrire un email sur un shard on regarde les autres.
+# deux creations du meme email tombent sur le meme shard (placement par email) et restent departagées par l'index.
+# avec un loader, les verifications des creations simultanées partent en une requete IN par shard
+
+async def check_email_free(
+    database: ShardedDatabase, email: str, shard: int, user_loader: Optional["UserLoader"] = None
+) -> None:
+    if database.shard_count == 1:
+        return
+    if user_loader is not None:
+        if await user_loader.load_by_email(email) is not None:
+            raise DuplicateEmailError(email)
+        return
+
+    async def owner(other: int) -> Optional[int]:
+        if other == shard:
+            return None
+        async with database.read_session(other) as session:
+            return await session.scalar(select(User.id).where(User.email == email))
+
+    if any(user_id is not None for user_id in await database.scatter_gather(owner)):
+        raise DuplicateEmailError(email)
+
+
+class UserRepositories:
+    def __init__(
+        self,
+        session_factory: Callable[..., AbstractAsyncContextManager[AsyncSession]],
+        database: ShardedDatabase,
+        user_cache: Optional[UserCache] = None,
+        session_store: Optional["SessionStore"] = None
+    ) -> None:
+        # session_factory(shard) donne la session partagée de la requete pour ce shard
+        self.session_factory = session_factory
+        self.database = database
+        self.user_cache = user_cache
+        self.session_store = session_store
+
+# pagination par clé (keyset) sur (created_date, id) au lieu de OFFSET: chaque page est une recherche
+# dans l'index ix_users_created_date (qui contient deja l'id, alias du rowid), le cout ne depend pas du numero de page
+# chaque shard renvoie ses limit premieres lignes apres le curseur, la page est la fusion triée des N listes
+
+    async def list_users(
+        self,
+        limit: int,
+        after: Optional[Tuple[datetime, int]] = None,
+        email_prefix: Optional[str] = None
+    ) -> List[Row]:
+        query = select(User.id, User.email, User.name, User.role, User.created_date)
+        if after is not None:
+            query = query.where(tuple_(User.created_date, User.id) > tuple_(*after))
+        if email_prefix:
+            query = query.where(User.email.startswith(email_prefix.lower().strip(), autoescape=True))
+        query = query.order_by(User.created_date, User.id).limit(limit)
+
+        async def list_shard(shard: int) -> List[Row]:
+            async with self.session_factory(shard) as session:
+                result = await session.execute(query)
+                return result.all()
+
+        pages = await self.database.scatter_gather(list_shard)
+        if len(pages) == 1:
+            return pages[0]
+        return list(islice(heapq.merge(*pages, key=lambda row: (row.created_date, row.id)), limit))
+
+# export complet par curseur cote serveur: les lignes sont lues par paquets de chunk_size,
+# un paquet n'est demandé au curseur que lorsque le precedent a été consommé
+# les shards sont exportés l'un apres l'autre (ordre des id dans chaque shard), chacun avec sa propre session:
+# la session de la requete n'est pas gardée pendant tout le flux
+
+    async def stream_users(self, chunk_size: int) -> AsyncIterator[Sequence[Row]]:
+        query = (
+            select(User.id, User.email, User.name, User.role, User.created_date)
+            .order_by(User.id)
+            .execution_options(yield_per=chunk_size)
+        )
+        for shard in range(self.database.shard_count):
+            async with self.database.read_session(shard) as session:
+                result = await session.stream(query)
+                async for rows in result.partitions(chunk_size):
+                    yield rows
+
+    async def update_user(self, user_id: int, user_edit: UserEdit) -> bool:
+        values = user_edit.model_dump(exclude_unset=True)
+        if "email" in values:
+            values["email"] = values["email"].lower().strip()
+        if not values:
+            return False
+        shard = self.database.shard_for_id(user_id)
+        if "email" in values:
+            await check_email_free(self.database, values["email"], shard)
+
+        async def apply(session: AsyncSession):
+            old_email = await session.scalar(select(User.email).where(User.id == user_id))
+            result = await session.execute(update(User).where(User.id == user_id).values(**values))
+            return old_email, result.rowcount
+
+        old_email, rowcount = await self.database.write(shard, apply)
+        self._invalidate(user_id, old_email)
+        return rowcount > 0
+
+    async def delete_user(self, user_id: int) -> bool:
+        async def apply(session: AsyncSession):
+            old_email = await session.scalar(select(User.email).where(User.id == user_id))
+            result = await session.execute(delete(User).where(User.id == user_id))
+            return old_email, result.rowcount
+
+        old_email, rowcount = await self.database.write(self.database.shard_for_id(user_id), apply)
+        self._invalidate(user_id, old_email)
+        await self._invalidate_tokens(user_id)
+        return rowcount > 0
+
+    async def set_role(self, user_id: int, role: str) -> bool:
+        if role not in ROLES:
+            raise ValueError(f"unknown role {role!r}")
+
+        async def apply(session: AsyncSession):
+            old_email = await session.scalar(select(User.email).where(User.id == user_id))
+            result = await session.execute(update(User).where(User.id == user_id, User.role != role).values(role=role))
+            return old_email, result.rowcount
+
+        old_email, rowcount = await self.database.write(self.database.shard_for_id(user_id), apply)
+        if rowcount:
+            self._invalidate(user_id, old_email)
+            await self._invalidate_tokens(user_id)
+        return rowcount > 0
+
+    def _invalidate(self, user_id: int, email: Optional[str]) -> None:
+        if self.user_cache is not None:
+            self.user_cache.invalidate(user_id=user_id, email=email)
+
+    async def _invalidate_tokens(self, user_id: int) -> None:
+        if self.session_store is not None:
+            await self.session_store.invalidate_user(user_id)
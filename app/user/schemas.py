@@ -1,5 +1,6 @@
-from pydantic import BaseModel, Field
-from typing import Optional
+from datetime import datetime
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, Optional
 from typing_extensions import Annotated
 
 
@@ -8,7 +9,17 @@ class UserBase(BaseModel):
     name: Optional[str]=None
 
 class UserOut(BaseModel):
-    pass 
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    email: str
+    name: str
+    role: str
+    created_date: datetime
+
+class UserPage(BaseModel):
+    items: List[UserOut]
+    next_cursor: Optional[str] = None
 
 class UserLogin(UserBase):
     password : str
@@ -19,8 +30,6 @@ class UserCreate(UserBase):
     class config:
         orm_mode =True
     
-# class UserEdit(UserBase):
-#     password = str = Field(max_length=10)
-    
-#     class config:
-#         orm_mode =True
\ No newline at end of file
+class UserEdit(BaseModel):
+    email: Optional[str] = None
+    name: Optional[str] = None
\ No newline at end of file
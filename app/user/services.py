@@ -0,0 +1,67 @@
+# service user module
+
+import base64
+import json
+from datetime import datetime
+from typing import TYPE_CHECKING, AsyncIterator, Optional, Tuple
+
+from app.core.exports import csv_chunks, ndjson_chunks
+from app.user.schemas import UserEdit, UserOut, UserPage
+
+if TYPE_CHECKING:
+    from app.user.repositories import UserRepositories
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+# le curseur est opaque pour le client: (created_date, id) de la derniere ligne, en json puis base64url
+
+def encode_cursor(created_date: datetime, user_id: int) -> str:
+    raw = json.dumps([created_date.isoformat(), user_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_date, user_id = json.loads(raw)
+        return datetime.fromisoformat(created_date), int(user_id)
+    except (ValueError, TypeError) as err:
+        raise InvalidCursorError("invalid cursor") from err
+
+
+EXPORT_COLUMNS = ("id", "email", "name", "role", "created_date")
+
+
+class UserServices:
+    def __init__(self, user_repository: "UserRepositories", export_chunk_size: int = 1000) -> None:
+        self.user_repository: "UserRepositories" = user_repository
+        self.export_chunk_size = int(export_chunk_size)
+
+    async def list_users(self, limit: int, cursor: Optional[str] = None, email_prefix: Optional[str] = None) -> UserPage:
+        after = decode_cursor(cursor) if cursor else None
+        # une ligne de plus pour savoir s'il existe une page suivante
+        rows = await self.user_repository.list_users(limit + 1, after, email_prefix)
+        items = [UserOut.model_validate(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = items[-1]
+            next_cursor = encode_cursor(last.created_date, last.id)
+        return UserPage(items=items, next_cursor=next_cursor)
+
+    def export_users_ndjson(self) -> AsyncIterator[bytes]:
+        return ndjson_chunks(self.user_repository.stream_users(self.export_chunk_size))
+
+    def export_users_csv(self) -> AsyncIterator[bytes]:
+        return csv_chunks(self.user_repository.stream_users(self.export_chunk_size), EXPORT_COLUMNS)
+
+    async def update_user(self, user_id: int, user_edit: UserEdit) -> bool:
+        return await self.user_repository.update_user(user_id, user_edit)
+
+    async def delete_user(self, user_id: int) -> bool:
+        return await self.user_repository.delete_user(user_id)
+
+    async def set_role(self, user_id: int, role: str) -> bool:
+        return await self.user_repository.set_role(user_id, role)
@@ -0,0 +1,54 @@
+# micro benchmark de la verification du cookie d'authentification
+# compare l'ancien sha256 salé au jeton signé par HMAC, sans et avec le cache des cookies deja verifiés
+#
+#   APP_DEV=1 python -m benchmarks.bench_cookie_auth
+
+import hashlib
+import timeit
+
+from app.core.cookies import cookie_auth
+
+
+def _legacy_hash_text(text: str) -> str:
+    text = "_salty" + text + "__text"
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _legacy_verify(val: str):
+    part = val.split(":")
+    if len(part) != 2:
+        return None
+    if _legacy_hash_text(part[0]) != part[1]:
+        return None
+    return int(part[0])
+
+
+class _Response:
+    def set_cookie(self, name, value, **kwargs):
+        self.value = value
+
+
+def main(number: int = 200000) -> None:
+    legacy_val = f"42:{_legacy_hash_text('42')}"
+    response = _Response()
+    cookie_auth.set_auth(response, 42, "Mario", "customer")
+    signed_val = response.value
+
+    def cold():
+        cookie_auth._verified.clear()
+        cookie_auth.verify_auth_value(signed_val)
+
+    def clear_only():
+        cookie_auth._verified.clear()
+
+    results = {
+        "legacy sha256": timeit.timeit(lambda: _legacy_verify(legacy_val), number=number),
+        "token (cold)": timeit.timeit(cold, number=number) - timeit.timeit(clear_only, number=number),
+        "token (cached)": timeit.timeit(lambda: cookie_auth.verify_auth_value(signed_val), number=number),
+    }
+    for name, total in results.items():
+        print(f"{name:<16} {total / number * 1e9:8.0f} ns/request")
+
+
+if __name__ == "__main__":
+    main()
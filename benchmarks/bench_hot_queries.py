@@ -0,0 +1,81 @@
+# benchmark des requetes chaudes: chemin ORM actuel contre registre hot_queries (Core + UserSnapshot)
+# mesure la latence par recherche et le pic de memoire alloué pendant chaque recherche (tracemalloc)
+#
+#   python -m benchmarks.bench_hot_queries --rows 10000 --lookups 20000
+
+import argparse
+import time
+import tracemalloc
+
+from sqlalchemy import create_engine
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session
+
+from app.bd.database import Base
+from app.bd.hot_queries import hot_queries
+from app.user.models import User
+from app.user.queries import USER_BY_EMAIL
+
+
+def orm_lookup(session: Session, email: str):
+    return session.execute(select(User).filter(User.email == email)).scalar_one_or_none()
+
+
+def hot_lookup(session: Session, email: str):
+    query = hot_queries.get(USER_BY_EMAIL)
+    row = session.connection().execute(query.statement, {"email": email}).first()
+    return query.row_factory(*row) if row is not None else None
+
+
+def measure(name: str, lookup, session: Session, emails) -> None:
+    started = time.perf_counter()
+    for email in emails:
+        lookup(session, email)
+        session.expunge_all()
+    elapsed = time.perf_counter() - started
+
+    # pic de memoire pendant chaque recherche (reset_peak avant, lecture du pic apres):
+    # mesure ce que la recherche alloue, meme si tout est liberé a la fin
+    sample = emails[:1000]
+    peaks = []
+    tracemalloc.start()
+    for email in sample:
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        lookup(session, email)
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - baseline)
+        session.expunge_all()
+    tracemalloc.stop()
+    peaks.sort()
+
+    print(
+        f"{name:<6} {elapsed / len(emails) * 1e6:8.1f} us/lookup  "
+        f"{sum(peaks) / len(peaks):8.0f} B peak/lookup (p50 {peaks[len(peaks) // 2]}, max {peaks[-1]})"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--lookups", type=int, default=20000)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [
+            {"email": f"user{i}@example.com", "name": f"user {i}", "hash_password": "x" * 60}
+            for i in range(args.rows)
+        ])
+
+    emails = [f"user{(i * 7919) % args.rows}@example.com" for i in range(args.lookups)]
+    with Session(engine) as session:
+        orm_lookup(session, emails[0])
+        hot_lookup(session, emails[0])
+        measure("orm", orm_lookup, session, emails)
+        measure("hot", hot_lookup, session, emails)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# benchmark de la serialisation des grandes reponses: chemin par defaut de FastAPI (jsonable_encoder + json),
+# model_dump + orjson (ORJSONResponse) et TypeAdapter.dump_json en cache (ModelResponse)
+# mesure le debit en octets/s et les allocations (tracemalloc) pour une UserPage de --items utilisateurs
+#
+#   python -m benchmarks.bench_json_responses --items 5000 --repeat 20
+
+import argparse
+import json
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from app.core.responses import dump_json
+from app.user.schemas import UserOut, UserPage
+
+
+def default_path(page: UserPage) -> bytes:
+    return json.dumps(
+        jsonable_encoder(page), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def orjson_path(page: UserPage) -> bytes:
+    return orjson.dumps(page.model_dump(), option=orjson.OPT_NON_STR_KEYS)
+
+
+def adapter_path(page: UserPage) -> bytes:
+    return dump_json(page)
+
+
+def measure(name: str, render, page: UserPage, repeat: int) -> None:
+    render(page)
+
+    started = time.perf_counter()
+    size = 0
+    for _ in range(repeat):
+        size += len(render(page))
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    render(page)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{name:<8} {elapsed / repeat * 1000:8.2f} ms/response  {size / elapsed / 1e6:8.1f} MB/s  {peak / 1e6:8.2f} MB peak")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    start = datetime(2020, 1, 1)
+    page = UserPage(
+        items=[
+            UserOut(id=i, email=f"user{i}@example.com", name=f"user {i}", role="customer", created_date=start + timedelta(seconds=i))
+            for i in range(args.items)
+        ],
+        next_cursor="cursor"
+    )
+
+    measure("default", default_path, page, args.repeat)
+    measure("orjson", orjson_path, page, args.repeat)
+    measure("adapter", adapter_path, page, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
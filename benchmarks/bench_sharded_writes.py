@@ -0,0 +1,88 @@
+# benchmark du debit d'ecriture selon le nombre de shards
+# --processes processus (comme les workers du launcher) creent des utilisateurs en parallele par le meme chemin
+# que l'application (AuthRepositories.create_user): placement par email, allocation d'id, ecrivain unique et
+# group commit de chaque shard. avec un seul fichier les ecrivains des processus se disputent son verrou
+#
+#   python -m benchmarks.bench_sharded_writes --shards 1 2 4 --processes 4 --users 8000 --preset durable
+
+import argparse
+import asyncio
+import multiprocessing
+import tempfile
+import time
+from typing import Tuple
+
+from app.auth.repositories import AuthRepositories
+from app.bd.sharding import ShardedDatabase
+from app.user.loaders import UserLoader
+from app.user.schemas import UserCreate
+
+
+class NoHash:
+    async def hash(self, password: str) -> str:
+        return password
+
+
+def open_database(directory: str, shard_count: int, preset: str) -> ShardedDatabase:
+    return ShardedDatabase(
+        f"sqlite+aiosqlite:///{directory}/users.db",
+        shard_count=shard_count,
+        url_template=f"sqlite+aiosqlite:///{directory}/users.{{shard}}.db",
+        performance_preset=preset
+    )
+
+
+async def create_users(directory: str, shard_count: int, preset: str, first: int, count: int, concurrency: int) -> None:
+    database = open_database(directory, shard_count, preset)
+    await database.warm_up()
+    repository = AuthRepositories(database.read_session, database, NoHash(), user_loader=UserLoader(database))
+    queue = iter(range(first, first + count))
+
+    async def worker() -> None:
+        for i in queue:
+            await repository.create_user(UserCreate(email=f"user{i}@example.com", password="x"))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    await database.dispose()
+
+
+def run_process(job: Tuple[str, int, str, int, int, int]) -> None:
+    asyncio.run(create_users(*job))
+
+
+async def create_schema(directory: str, shard_count: int, preset: str) -> None:
+    database = open_database(directory, shard_count, preset)
+    await database.create_database()
+    await database.dispose()
+
+
+def measure(shard_count: int, users: int, processes: int, concurrency: int, preset: str) -> float:
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(create_schema(directory, shard_count, preset))
+        per_process = users // processes
+        jobs = [(directory, shard_count, preset, p * per_process, per_process, concurrency) for p in range(processes)]
+        with multiprocessing.get_context("spawn").Pool(processes) as pool:
+            started = time.perf_counter()
+            pool.map(run_process, jobs)
+            elapsed = time.perf_counter() - started
+    return per_process * processes / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--users", type=int, default=8000)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=100, help="concurrent creates per process")
+    parser.add_argument("--preset", default="durable")
+    args = parser.parse_args()
+
+    baseline = None
+    for shard_count in args.shards:
+        rate = measure(shard_count, args.users, args.processes, args.concurrency, args.preset)
+        baseline = baseline or rate
+        print(f"{shard_count:>2} shards  {rate:10.0f} creates/s  x{rate / baseline:.2f}")
+
+
+if __name__ == "__main__":
+    main()
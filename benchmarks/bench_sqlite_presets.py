@@ -0,0 +1,58 @@
+# benchmark des profils de performance SQLite
+# insertions (une transaction par ligne, comme une creation d'utilisateur) puis recherches par email
+#
+#   python -m benchmarks.bench_sqlite_presets --rows 5000
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+from app.bd.pragmas import PRESETS, pragma_statements, resolve_profile
+
+
+def run(preset: str, rows: int, lookups: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        conn = sqlite3.connect(path, isolation_level=None)
+        for statement in pragma_statements(resolve_profile(preset)):
+            conn.execute(statement)
+        conn.execute(
+            "CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT UNIQUE NOT NULL, name TEXT NOT NULL, "
+            "hash_password TEXT NOT NULL, created_date TIMESTAMP)"
+        )
+
+        started = time.perf_counter()
+        for i in range(rows):
+            conn.execute("BEGIN")
+            conn.execute(
+                "INSERT INTO users (email, name, hash_password, created_date) VALUES (?, ?, ?, datetime('now'))",
+                (f"user{i}@example.com", f"user {i}", "x" * 60)
+            )
+            conn.execute("COMMIT")
+        insert_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for i in range(lookups):
+            conn.execute("SELECT * FROM users WHERE email = ?", (f"user{(i * 7919) % rows}@example.com",)).fetchone()
+        lookup_time = time.perf_counter() - started
+        conn.close()
+
+    return {"inserts/s": rows / insert_time, "lookups/s": lookups / lookup_time}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--lookups", type=int, default=50000)
+    args = parser.parse_args()
+
+    print(f"{'preset':<10} {'inserts/s':>12} {'lookups/s':>12}")
+    for preset in PRESETS:
+        result = run(preset, args.rows, args.lookups)
+        print(f"{preset:<10} {result['inserts/s']:>12.0f} {result['lookups/s']:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# benchmark de la pagination des utilisateurs: OFFSET contre keyset sur (created_date, id)
+# genere une table users de plusieurs millions de lignes avec l'index ix_users_created_date du modele
+#
+#   python -m benchmarks.bench_user_keyset --rows 3000000
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+PAGE_SIZE = 50
+COLUMNS = "id, email, name, role, created_date"
+
+
+def populate(conn: sqlite3.Connection, rows: int) -> None:
+    conn.execute(
+        "CREATE TABLE users (id INTEGER PRIMARY KEY, email VARCHAR NOT NULL UNIQUE, name VARCHAR NOT NULL, "
+        "hash_password VARCHAR NOT NULL, role VARCHAR NOT NULL DEFAULT 'customer', created_date DATETIME)"
+    )
+    conn.execute("CREATE INDEX ix_users_created_date ON users (created_date)")
+    start = datetime(2020, 1, 1)
+    # plusieurs utilisateurs par seconde: des created_date identiques, departagés par l'id
+    conn.executemany(
+        "INSERT INTO users (email, name, hash_password, created_date) VALUES (?, ?, ?, ?)",
+        (
+            (f"user{i}@example.com", f"user {i}", "x", (start + timedelta(seconds=i // 3)).isoformat(" "))
+            for i in range(rows)
+        )
+    )
+    conn.commit()
+
+
+def offset_page(conn: sqlite3.Connection, page: int) -> list:
+    return conn.execute(
+        f"SELECT {COLUMNS} FROM users ORDER BY created_date, id LIMIT ? OFFSET ?",
+        (PAGE_SIZE, page * PAGE_SIZE)
+    ).fetchall()
+
+
+def keyset_page(conn: sqlite3.Connection, after) -> list:
+    if after is None:
+        return conn.execute(
+            f"SELECT {COLUMNS} FROM users ORDER BY created_date, id LIMIT ?", (PAGE_SIZE,)
+        ).fetchall()
+    return conn.execute(
+        f"SELECT {COLUMNS} FROM users WHERE (created_date, id) > (?, ?) ORDER BY created_date, id LIMIT ?",
+        (after[0], after[1], PAGE_SIZE)
+    ).fetchall()
+
+
+def timed(fn, *args, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=3_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "bench.db"))
+        started = time.perf_counter()
+        populate(conn, args.rows)
+        print(f"generated {args.rows} users in {time.perf_counter() - started:.1f}s")
+
+        plan = conn.execute(
+            f"EXPLAIN QUERY PLAN SELECT {COLUMNS} FROM users WHERE (created_date, id) > (?, ?) "
+            "ORDER BY created_date, id LIMIT 50", ("2020-01-01 00:00:00", 0)
+        ).fetchall()
+        print("keyset plan:", "; ".join(row[-1] for row in plan))
+
+        print(f"{'page':>8} {'offset ms':>10} {'keyset ms':>10}")
+        for page in (0, 100, 1000, 10000):
+            if page * PAGE_SIZE >= args.rows:
+                break
+            # curseur de la page: derniere ligne de la page precedente, comme le renverrait l'API
+            previous = offset_page(conn, page - 1)[-1] if page else None
+            after = (previous[4], previous[0]) if previous else None
+            assert keyset_page(conn, after) == offset_page(conn, page)
+            print(f"{page:>8} {timed(offset_page, conn, page):>10.2f} {timed(keyset_page, conn, after):>10.2f}")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# verification du temps d'import de l'application (demarrage a froid d'un worker)
+# lance "python -X importtime -c 'import fastapi; import main'" dans un processus neuf, affiche les modules
+# les plus couteux et sort en erreur si ce que main ajoute a fastapi depasse le budget
+# (services.app.server.import_budget_ms). fastapi est mesuré a part: son cout depend de la machine,
+# pas de l'application
+#
+#   python -m benchmarks.check_import_budget --top 15
+
+import argparse
+import subprocess
+import sys
+from typing import List, Optional, Tuple
+
+import yaml
+
+
+def measure_imports(module: str, baseline: Optional[str] = None) -> List[Tuple[str, int]]:
+    # chaque ligne de stderr: "import time: self [us] | cumulative | module"
+    # baseline est importé juste avant: le temps cumulé de module ne compte plus ce qu'ils partagent
+    code = f"import {baseline}; import {module}" if baseline else f"import {module}"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr)
+        raise SystemExit(f"import {module} failed")
+
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        timings.append((name.rstrip(), int(cumulative)))
+    return timings
+
+
+def import_ms(timings: List[Tuple[str, int]], module: str) -> float:
+    return next(us for name, us in timings if name.strip() == module) / 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config", default="config.yml")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--baseline", default="fastapi", help="imported first and left out of the budget, '' for none")
+    parser.add_argument("--budget-ms", type=float, default=None)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    budget_ms = args.budget_ms
+    if budget_ms is None:
+        with open(args.config, encoding="utf-8") as fh:
+            budget_ms = float(yaml.safe_load(fh)["services"]["app"]["server"]["import_budget_ms"])
+
+    timings = measure_imports(args.module, args.baseline or None)
+    top_level = [(name.strip(), us) for name, us in timings if not name.startswith("  ")]
+    total_ms = import_ms(timings, args.module)
+
+    print(f"{'module':<40} {'cumulative':>12}")
+    for name, us in sorted(top_level, key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"{name:<40} {us / 1000:9.1f} ms")
+    if args.baseline:
+        print(f"\nimport {args.baseline}: {import_ms(timings, args.baseline):.1f} ms (not budgeted)")
+    print(f"import {args.module}: {total_ms:.1f} ms (budget {budget_ms:.0f} ms)")
+
+    if total_ms > budget_ms:
+        raise SystemExit(f"import time over budget by {total_ms - budget_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
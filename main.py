@@ -1,18 +1,48 @@
+import os
+import sys
+
+# un seul point d'entrée: python -m app.launcher. "python main.py" y est renvoyé avant tout import:
+# sinon le maitre construirait l'application deux fois (ce fichier sous __main__, puis sous main au
+# prechauffage) et chaque processus du pool de hash re-executerait ce fichier a son demarrage
+if __name__ == "__main__":
+    os.execv(sys.executable, [sys.executable, "-m", "app.launcher", *sys.argv[1:]])
+
+from typing import Optional
+
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from app.containers import Containers
+from app.core.viewmodels import config as app_config
 from app.auth import endpoint as auth_endpoints
-from app.core import cookies
-import asyncio
+from app.core.middleware import AuthenticationMiddleware, QueryStatsMiddleware, UnitOfWorkMiddleware
+from app.lifespan import lifespan
+from app.monitoring import endpoint as monitoring_endpoints
+from app.user import endpoint as user_endpoints
+
+
+# le conteneur est créé ici, les ressources (pools, moteurs) sont démarrées et libérées par le lifespan
+# les middlewares recoivent les providers: aucun moteur ni pool n'est créé a l'import de main
+# la configuration est celle du lanceur (APP_CONFIG): maitre et workers lisent le meme fichier
 
-import uvicorn
+def create_app(config_path: Optional[str] = None) -> FastAPI:
+    container = Containers()
+    container.config.from_yaml(config_path or app_config.APP_CONFIG, required=True)
+    container.wire(modules=[auth_endpoints, monitoring_endpoints, user_endpoints])
 
-app = FastAPI()
+    app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+    app.container = container
+    app.add_middleware(AuthenticationMiddleware, user_cache=container.user_cache)
+    app.add_middleware(
+        QueryStatsMiddleware,
+        n_plus_one_threshold=container.config.services.app.instrumentation.n_plus_one_threshold()
+    )
+    app.add_middleware(UnitOfWorkMiddleware, session_scope=container.request_session)
+    app.include_router(auth_endpoints.auth)
+    app.include_router(monitoring_endpoints.monitoring)
+    app.include_router(user_endpoints.users)
+    return app
 
-def create_app() -> None:
-    uvicorn.run(app)
 
+# uvicorn main:app ou app.launcher (plusieurs workers): importer main ne demarre rien
 
-if __name__ =="__main__":
-    asyncio.run(create_app())
-else:
-    uvicorn.run(app)
+app = create_app()
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from app.core.cookies import cookie_auth, tokens
+from app.core.viewmodels import config
+
+
+class _Response:
+    def set_cookie(self, name, value, **kwargs):
+        self.value = value
+
+
+def test_without_secret_startup_and_signing_fail(monkeypatch):
+    monkeypatch.setattr(config, "AUTH_COOKIE_SECRETS", [])
+    with pytest.raises(RuntimeError):
+        config.check_auth_secrets()
+    with pytest.raises(RuntimeError):
+        cookie_auth.set_auth(_Response(), 1, "admin", "admin")
+
+
+def test_token_signed_with_former_default_is_rejected(monkeypatch):
+    monkeypatch.setattr(cookie_auth, "_secrets", [])
+    forged = tokens.encode_token(b"change-me-in-production", 1, "admin", "admin", 3600)
+    assert cookie_auth.verify_auth_value(forged) is None
+
+
+def test_configured_secret_round_trip(monkeypatch):
+    monkeypatch.setattr(config, "AUTH_COOKIE_SECRETS", ["test-secret"])
+    monkeypatch.setattr(cookie_auth, "_secrets", [b"test-secret"])
+    response = _Response()
+    cookie_auth.set_auth(response, 7, "Luigi", "staff")
+    session = cookie_auth.verify_auth_value(response.value)
+    assert (session.user_id, session.role) == (7, "staff")
+
+
+def test_session_data_follows_the_session_cookie(tmp_path):
+    from fastapi import Response
+    from starlette.requests import Request
+
+    from app.core.cookies.session_store import SessionStore
+
+    def request(cookie=None):
+        headers = [(b"cookie", f"{cookie_auth.session_cookie_name}={cookie}".encode())] if cookie else []
+        return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+    async def scenario():
+        store = SessionStore(str(tmp_path / "sessions.db"))
+        try:
+            response = Response()
+            session_id, data = await cookie_auth.load_session_data(request(), response, store)
+            assert data == {}
+            assert f"{cookie_auth.session_cookie_name}={session_id}" in response.headers["set-cookie"]
+            data["cart"] = [3]
+            store.set(session_id, data)
+
+            # meme cookie: memes donnees, pas de nouveau cookie
+            response = Response()
+            assert await cookie_auth.load_session_data(request(session_id), response, store) == (session_id, {"cart": [3]})
+            assert "set-cookie" not in response.headers
+
+            # cookie inconnu du store: nouvelle session
+            response = Response()
+            other_id, other = await cookie_auth.load_session_data(request("unknown"), response, store)
+            assert other_id != "unknown" and other == {}
+            assert other_id in response.headers["set-cookie"]
+        finally:
+            await store.stop()
+
+    asyncio.run(scenario())
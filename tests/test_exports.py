@@ -0,0 +1,28 @@
+import asyncio
+import csv
+import io
+
+from app.core.exports import csv_chunks
+
+
+def test_csv_export_neutralizes_formula_cells():
+    rows = [
+        (1, "=HYPERLINK(\"http://evil\")", "a@example.com"),
+        (2, "+33 6 12", "-x@example.com"),
+        (3, "@SUM(A1)", "plain@example.com"),
+        (-4, "Luigi", "\tb@example.com"),
+    ]
+
+    async def partitions():
+        yield rows
+
+    async def collect():
+        return b"".join([chunk async for chunk in csv_chunks(partitions(), ("id", "name", "email"))])
+
+    parsed = list(csv.reader(io.StringIO(asyncio.run(collect()).decode("utf-8"))))
+    assert parsed[1:] == [
+        ["1", "'=HYPERLINK(\"http://evil\")", "a@example.com"],
+        ["2", "'+33 6 12", "'-x@example.com"],
+        ["3", "'@SUM(A1)", "plain@example.com"],
+        ["-4", "Luigi", "'\tb@example.com"],
+    ]
@@ -0,0 +1,34 @@
+import asyncio
+
+import pytest
+
+from app.auth.hashing import HashingBusyError, PasswordHasher
+
+
+class SlowCalibration(PasswordHasher):
+    def __init__(self) -> None:
+        super().__init__(pool_size=1, queue_depth=1, latency_budget_ms=250)
+        self.release = asyncio.Event()
+
+    async def calibrate(self):
+        await self.release.wait()
+        raise RuntimeError("calibration failed")
+
+
+def test_calls_waiting_for_calibration_hold_their_slot():
+    async def scenario():
+        hasher = SlowCalibration()
+        waiting = [asyncio.ensure_future(hasher.hash("pw")) for _ in range(2)]
+        await asyncio.sleep(0)
+        assert hasher.pending == 2
+        with pytest.raises(HashingBusyError):
+            await hasher.hash("pw")
+
+        # calibration en echec: les places reservées sont rendues
+        hasher.release.set()
+        results = await asyncio.gather(*waiting, return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert hasher.pending == 0
+        assert hasher.metrics.rejected == 1
+
+    asyncio.run(scenario())
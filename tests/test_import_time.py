@@ -0,0 +1,25 @@
+import subprocess
+import sys
+
+import yaml
+
+from benchmarks.check_import_budget import import_ms, measure_imports
+
+
+def test_import_main_does_not_load_database_or_hashing():
+    heavy = ["sqlalchemy", "aiosqlite", "passlib", "concurrent.futures.process"]
+    result = subprocess.run(
+        [sys.executable, "-c", f"import sys, main; print([m for m in {heavy!r} if m in sys.modules])"],
+        capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == "[]"
+
+
+def test_import_main_stays_within_budget_beyond_fastapi():
+    with open("config.yml", encoding="utf-8") as fh:
+        budget_ms = float(yaml.safe_load(fh)["services"]["app"]["server"]["import_budget_ms"])
+
+    # fastapi est importé d'abord dans le meme processus: seul ce que l'application ajoute est compté,
+    # le meilleur de trois processus neufs ecarte le bruit de la machine
+    best_ms = min(import_ms(measure_imports("main", "fastapi"), "main") for _ in range(3))
+    assert best_ms <= budget_ms
@@ -0,0 +1,60 @@
+import json
+
+from sqlalchemy import select
+
+from app.bd.database import Base
+from app.bd.migrations import ensure_schema_sync
+from app.bd.sharding import shard_index
+from app.cli.common import create_sync_engine
+from app.cli.import_users import insert_rows, main, resolve_rounds, truncate_rejects
+from app.user.models import User
+
+
+def test_resume_drops_rejects_past_the_checkpoint(tmp_path):
+    rejects = tmp_path / "users.jsonl.rejects"
+    rejects.write_text("".join(json.dumps({"row": row, "errors": []}) + "\n" for row in (2, 4, 7)))
+    truncate_rejects(str(rejects), 4)
+    assert [json.loads(line)["row"] for line in rejects.read_text().splitlines()] == [2, 4]
+
+
+def test_rounds_follow_the_saved_calibration(tmp_path):
+    path = tmp_path / "bcrypt_rounds.json"
+    path.write_text(json.dumps({"rounds": 11, "latency_budget_ms": 250, "min_rounds": 10, "max_rounds": 15}))
+    hashing = {"rounds": None, "latency_budget_ms": 250, "min_rounds": 10, "max_rounds": 15, "calibration_path": str(path)}
+    assert resolve_rounds(hashing) == 11
+    assert resolve_rounds(dict(hashing, rounds=12)) == 12
+
+
+def test_sharded_import_routes_rows_by_email_and_skips_known_emails(tmp_path):
+    engines = [create_sync_engine(f"sqlite:///{tmp_path / f'users.{shard}.db'}") for shard in range(3)]
+    for engine in engines:
+        ensure_schema_sync(engine, Base.metadata)
+    rows = [{"email": f"user{i}@example.com", "name": "", "hash_password": "x"} for i in range(20)]
+    assert insert_rows(engines, [dict(row) for row in rows]) == 20
+    # un second passage (reprise) n'insere rien
+    assert insert_rows(engines, [dict(row) for row in rows]) == 0
+
+    for shard, engine in enumerate(engines):
+        with engine.connect() as conn:
+            for user_id, email in conn.execute(select(User.id, User.email)):
+                assert user_id % 3 == shard == shard_index(email, 3)
+        engine.dispose()
+
+
+def test_malformed_jsonl_lines_are_rejected_with_their_row(tmp_path):
+    source = tmp_path / "users.jsonl"
+    source.write_text("\n".join([
+        json.dumps({"email": "first@example.com", "password": "secret123"}),
+        '{"email": "broken@example.com", "password": ',
+        json.dumps(["not", "an", "object"]),
+        json.dumps({"email": "last@example.com", "password": "secret123"}),
+    ]) + "\n")
+    db_url = f"sqlite:///{tmp_path / 'users.db'}"
+    assert main([str(source), "--db-url", db_url, "--rounds", "4", "--workers", "1"]) == 0
+
+    rejects = [json.loads(line) for line in (tmp_path / "users.jsonl.rejects").read_text().splitlines()]
+    assert [(reject["row"], reject["errors"][0]["type"]) for reject in rejects] == [(2, "json_invalid"), (3, "model_type")]
+    engine = create_sync_engine(db_url)
+    with engine.connect() as conn:
+        assert sorted(conn.execute(select(User.email)).scalars()) == ["first@example.com", "last@example.com"]
+    engine.dispose()
@@ -0,0 +1,23 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from app.bd.instrumentation import QueryMonitor, normalize_sql
+
+
+def test_in_lists_of_any_length_share_one_shape():
+    assert normalize_sql("SELECT * FROM users WHERE id IN (?)") == normalize_sql("SELECT * FROM users WHERE id IN (?, ?, ?)")
+
+
+def test_failed_statements_do_not_leak_their_start_time():
+    engine = create_engine("sqlite://")
+    monitor = QueryMonitor()
+    monitor.attach(engine)
+    with engine.connect() as conn:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM missing_table"))
+        assert conn.execute(text("SELECT 1")).scalar() == 1
+        assert conn.connection.info["query_start"] == []
+    assert monitor.histograms["SELECT ?"].count == 1
+    engine.dispose()
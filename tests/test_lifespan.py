@@ -0,0 +1,51 @@
+import asyncio
+import sqlite3
+
+import pytest
+import yaml
+from dependency_injector import providers
+from fastapi import FastAPI
+
+from app.containers import Containers
+from app.core.viewmodels import config as app_config
+from app.lifespan import lifespan
+
+
+class FailingHasher:
+    def __init__(self) -> None:
+        self.shut_down = False
+
+    async def warm_up(self) -> None:
+        raise RuntimeError("hashing pool failed to start")
+
+    def shutdown(self) -> None:
+        self.shut_down = True
+
+
+def test_failed_startup_releases_what_was_started(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_config, "AUTH_COOKIE_SECRETS", ["test-secret"])
+    with open("config.yml", encoding="utf-8") as fh:
+        settings = yaml.safe_load(fh)
+    settings["services"]["app"]["environnement"]["SQLITE_URL"] = f"sqlite+aiosqlite:///{tmp_path / 'app.db'}"
+    settings["services"]["app"]["sessions"]["path"] = str(tmp_path / "sessions.db")
+
+    container = Containers()
+    container.config.from_dict(settings)
+    hasher = FailingHasher()
+    container.password_hasher.override(providers.Object(hasher))
+    app = FastAPI()
+    app.container = container
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            async with lifespan(app):
+                pass
+
+    asyncio.run(scenario())
+    assert hasher.shut_down
+    assert all(engine.pool.checkedout() == 0 for engine in container.bd().engines)
+    with pytest.raises(Exception):
+        container.session_store()._db.execute("SELECT 1")
+    # le schema est créé avant l'echec: les tables des modeles sont enregistrées par le lifespan
+    with sqlite3.connect(tmp_path / "app.db") as db:
+        assert db.execute("SELECT name FROM sqlite_master WHERE name = 'users'").fetchone()
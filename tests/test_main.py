@@ -0,0 +1,29 @@
+import os
+import subprocess
+import sys
+
+import yaml
+
+import main
+from app.core.viewmodels import config as app_config
+
+
+def test_create_app_reads_the_launcher_config(tmp_path, monkeypatch):
+    with open("config.yml", encoding="utf-8") as fh:
+        settings = yaml.safe_load(fh)
+    settings["services"]["app"]["environnement"]["SQLITE_URL"] = f"sqlite+aiosqlite:///{tmp_path / 'other.db'}"
+    path = tmp_path / "other.yml"
+    path.write_text(yaml.safe_dump(settings))
+
+    monkeypatch.setattr(app_config, "APP_CONFIG", str(path))
+    app = main.create_app()
+    assert app.container.config.services.app.environnement.SQLITE_URL() == f"sqlite+aiosqlite:///{tmp_path / 'other.db'}"
+
+
+def test_running_main_hands_over_to_the_launcher():
+    env = {key: value for key, value in os.environ.items() if key not in ("AUTH_COOKIE_SECRETS", "APP_DEV")}
+    # sans clé le lanceur s'arrete des son premier controle, avant de construire l'application
+    result = subprocess.run([sys.executable, "main.py"], capture_output=True, text=True, env=env, timeout=60)
+    assert result.returncode != 0
+    assert "AUTH_COOKIE_SECRETS is not set" in result.stderr
+    assert os.path.join("app", "launcher.py") in result.stderr
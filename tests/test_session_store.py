@@ -0,0 +1,94 @@
+import asyncio
+import time
+
+from app.core.cookies import tokens
+from app.core.cookies.session_store import SessionStore
+
+
+def test_revocation_is_shared_through_the_store(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "sessions.db")
+        worker_a, worker_b = SessionStore(path), SessionStore(path)
+        await worker_b.sync_revoked()
+        tokens._revoked.clear()
+
+        await worker_a.revoke_token(b"sessid01", int(time.time()) + 60)
+        tokens._revoked.clear()
+        assert await worker_b.sync_revoked() == 1
+        assert b"sessid01" in tokens._revoked
+
+        await worker_a.stop()
+        await worker_b.stop()
+
+    asyncio.run(scenario())
+
+
+def test_expired_revocations_are_pruned():
+    tokens._revoked.clear()
+    tokens.revoke(b"old00000", int(time.time()) - 1)
+    tokens.revoke(b"new00000", int(time.time()) + 60)
+    assert tokens.prune_revoked() == 1
+    assert list(tokens._revoked) == [b"new00000"]
+
+
+def test_changes_reach_the_other_workers(tmp_path):
+    from app.user.cache import UserCache, UserSnapshot
+
+    async def scenario():
+        path = str(tmp_path / "sessions.db")
+        worker_a, worker_b = SessionStore(path), SessionStore(path)
+        cache_a, cache_b = UserCache(), UserCache()
+        cache_a.share_through(worker_a)
+        cache_b.share_through(worker_b)
+        await worker_a.sync_changes()
+        await worker_b.sync_changes()
+
+        worker_a.set("cart", {"items": 1})
+        await worker_a.flush()
+        worker_b.set("cart", {"items": 2})
+        await worker_b.flush()
+        cache_b.put(UserSnapshot(1, "a@example.com", "a", "old-hash", None))
+        cache_a.invalidate(user_id=1)
+        await worker_a.flush()
+
+        await worker_a.sync_changes()
+        await worker_b.sync_changes()
+        assert cache_b.get_by_id(1) is None
+        assert (await worker_a.get("cart")) == {"items": 2}
+
+        await worker_a.stop()
+        await worker_b.stop()
+
+    asyncio.run(scenario())
+
+
+def test_user_invalidation_rejects_older_tokens_on_every_worker(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "sessions.db")
+        worker_a, worker_b = SessionStore(path), SessionStore(path)
+        await worker_b.start()
+        tokens._not_before.clear()
+        old = tokens.SessionToken(5, "Mario", "admin", int(time.time()) - 10, int(time.time()) + 60, b"sessid05")
+        try:
+            await worker_a.invalidate_user(5)
+            assert not old.is_valid()
+
+            # l'autre worker la recoit par le journal, un worker demarré ensuite la relit dans la table
+            tokens._not_before.clear()
+            await worker_a.flush()
+            assert await worker_b.sync_changes() == 1
+            assert not old.is_valid()
+
+            tokens._not_before.clear()
+            worker_c = SessionStore(path)
+            await worker_c.start()
+            await worker_c.stop()
+            assert not old.is_valid()
+            newer = tokens.SessionToken(5, "Mario", "customer", int(time.time()) + 2, int(time.time()) + 60, b"sessid06")
+            assert newer.is_valid()
+        finally:
+            tokens._not_before.clear()
+            await worker_a.stop()
+            await worker_b.stop()
+
+    asyncio.run(scenario())
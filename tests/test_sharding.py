@@ -0,0 +1,146 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from app.auth.repositories import AuthRepositories
+from app.bd.sharding import ShardedDatabase, next_id_for_shard, shard_index
+from app.cli.reshard import reshard
+from app.core.cookies import tokens
+from app.core.cookies.session_store import SessionStore
+from app.user.loaders import UserLoader
+from app.user.repositories import DuplicateEmailError, UserRepositories
+from app.user.schemas import UserCreate, UserEdit, UserLogin
+from app.user.services import UserServices
+
+SHARDS = 3
+
+
+class PlainHasher:
+    async def hash(self, password: str) -> str:
+        return "plain:" + password
+
+    async def verify_and_update(self, password: str, hashed: str):
+        return hashed == "plain:" + password, None
+
+
+def sharded(tmp_path) -> ShardedDatabase:
+    return ShardedDatabase(
+        f"sqlite+aiosqlite:///{tmp_path / 'unused.db'}",
+        shard_count=SHARDS,
+        url_template=f"sqlite+aiosqlite:///{tmp_path}/users.{{shard}}.db"
+    )
+
+
+def test_ids_allocated_on_a_shard_route_back_to_it():
+    for shard in range(SHARDS):
+        for max_id in range(10):
+            user_id = next_id_for_shard(max_id, shard, SHARDS)
+            assert user_id > max_id
+            assert shard_index(user_id, SHARDS) == shard
+
+
+def test_users_are_routed_through_the_shards_end_to_end(tmp_path):
+    emails = [f"user{i}@example.com" for i in range(12)]
+
+    async def scenario():
+        database = sharded(tmp_path)
+        await database.create_database()
+        await database.warm_up()
+        loader = UserLoader(database)
+        auth = AuthRepositories(database.read_session, database, PlainHasher(), user_loader=loader)
+        users = UserRepositories(database.read_session, database)
+        try:
+            created = [await auth.create_user(UserCreate(email=email, password="pw")) for email in emails]
+            for user in created:
+                # l'email choisit le shard, l'id y retombe
+                assert database.shard_for_id(user.id) == database.shard_for_email(user.email)
+            assert len({database.shard_for_id(user.id) for user in created}) > 1
+            assert len({user.id for user in created}) == len(created)
+
+            logged = await auth.login_user(UserLogin(email="USER3@example.com", password="pw"))
+            assert logged is not None and logged.email == "user3@example.com"
+            assert (await auth.get_user_by_id(created[5].id)).email == emails[5]
+
+            # la liste paginée fusionne les shards dans l'ordre (created_date, id)
+            services = UserServices(users)
+            seen, cursor = [], None
+            while True:
+                page = await services.list_users(5, cursor)
+                seen.extend(user.id for user in page.items)
+                if page.next_cursor is None:
+                    break
+                cursor = page.next_cursor
+            assert seen == [user.id for user in created]
+
+            exported = [row.id async for rows in users.stream_users(4) for row in rows]
+            assert sorted(exported) == sorted(user.id for user in created)
+
+            # un email qui change de shard reste trouvable, et reste unique entre shards
+            moved = created[0]
+            new_email = next(
+                f"moved{i}@example.com" for i in range(100)
+                if database.shard_for_email(f"moved{i}@example.com") != database.shard_for_id(moved.id)
+            )
+            assert await users.update_user(moved.id, UserEdit(email=new_email))
+            assert (await loader.load_by_email(new_email)).id == moved.id
+            with pytest.raises(DuplicateEmailError):
+                await auth.create_user(UserCreate(email=new_email, password="pw"))
+            with pytest.raises(DuplicateEmailError):
+                await users.update_user(created[1].id, UserEdit(email=new_email))
+
+            assert await users.delete_user(created[2].id)
+            assert await loader.load_by_id(created[2].id) is None
+        finally:
+            await database.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_role_change_and_deletion_invalidate_issued_tokens(tmp_path):
+    async def scenario():
+        database = sharded(tmp_path)
+        await database.create_database()
+        store = SessionStore(str(tmp_path / "sessions.db"))
+        auth = AuthRepositories(database.read_session, database, PlainHasher())
+        users = UserRepositories(database.read_session, database, session_store=store)
+        tokens._not_before.clear()
+        try:
+            promoted = await auth.create_user(UserCreate(email="staff@example.com", password="pw"))
+            deleted = await auth.create_user(UserCreate(email="gone@example.com", password="pw"))
+            issued = int(time.time()) - 1
+            staff = tokens.SessionToken(promoted.id, "", "customer", issued, issued + 60, b"sessid01")
+            gone = tokens.SessionToken(deleted.id, "", "customer", issued, issued + 60, b"sessid02")
+
+            assert await users.set_role(promoted.id, "admin")
+            # meme role: rien ne change, aucun jeton n'est invalidé
+            assert not await users.set_role(deleted.id, "customer")
+            assert not staff.is_valid() and gone.is_valid()
+            with pytest.raises(ValueError):
+                await users.set_role(promoted.id, "owner")
+
+            assert await users.delete_user(deleted.id)
+            assert not gone.is_valid()
+        finally:
+            tokens._not_before.clear()
+            await store.stop()
+            await database.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_reshard_splits_a_single_file_by_id(tmp_path):
+    source = tmp_path / "single.db"
+    conn = sqlite3.connect(source)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, email VARCHAR NOT NULL UNIQUE)")
+    conn.executemany("INSERT INTO users VALUES (?, ?)", [(i, f"user{i}@example.com") for i in range(1, 11)])
+    conn.commit()
+    conn.close()
+
+    outputs = reshard(str(source), SHARDS, str(tmp_path / "out.{shard}.db"), {"users": "id"})
+    for shard, path in enumerate(outputs):
+        with sqlite3.connect(path) as out:
+            ids = [row[0] for row in out.execute("SELECT id FROM users")]
+        assert ids and all(user_id % SHARDS == shard for user_id in ids)
+    assert sum(len(sqlite3.connect(path).execute("SELECT id FROM users").fetchall()) for path in outputs) == 10
@@ -0,0 +1,53 @@
+import asyncio
+
+from sqlalchemy import text
+
+from app.bd.sharding import ShardedDatabase
+from app.bd.unit_of_work import RequestSessionScope
+
+
+def test_nested_session_in_the_same_task_reuses_the_shared_session(tmp_path):
+    async def scenario():
+        database = ShardedDatabase(f"sqlite+aiosqlite:///{tmp_path / 'uow.db'}")
+        scope = RequestSessionScope(database)
+        async with scope.begin() as unit_of_work:
+            async with scope.session() as outer:
+                async with scope.session() as inner:
+                    assert inner is outer
+                    assert (await inner.execute(text("SELECT 1"))).scalar() == 1
+
+            async def concurrent_reader():
+                async with scope.session() as session:
+                    return (await session.execute(text("SELECT 2"))).scalar()
+
+            assert await asyncio.wait_for(asyncio.gather(concurrent_reader(), concurrent_reader()), 5) == [2, 2]
+        await database.dispose()
+        return unit_of_work.session_requests
+
+    assert asyncio.run(scenario()) == 4
+
+
+def test_fan_out_inside_a_session_block_reads_with_its_own_sessions(tmp_path):
+    async def scenario():
+        database = ShardedDatabase(f"sqlite+aiosqlite:///{tmp_path / 'uow.db'}")
+        scope = RequestSessionScope(database)
+
+        async def reader(value):
+            async with scope.session() as session:
+                return session, (await session.execute(text(f"SELECT {value}"))).scalar()
+
+        try:
+            async with scope.begin() as unit_of_work:
+                async with scope.session() as shared:
+                    # la session partagée est tenue par ce bloc: les taches de gather ne doivent pas l'attendre
+                    results = await asyncio.wait_for(asyncio.gather(reader(1), reader(2)), 5)
+                    assert [value for _, value in results] == [1, 2]
+                    assert all(session is not shared for session, _ in results)
+                    assert len(unit_of_work.sessions()) == 1
+            # la session partagée et les deux sessions des taches passent par les statistiques du pool
+            assert database.pool_status()["checkouts"] == 3
+            assert unit_of_work.checkouts == 3
+        finally:
+            await database.dispose()
+
+    asyncio.run(scenario())
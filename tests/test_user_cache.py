@@ -0,0 +1,20 @@
+from app.user.cache import UserCache, UserSnapshot
+
+
+def snapshot(user_id: int = 1, hash_password: str = "old") -> UserSnapshot:
+    return UserSnapshot(user_id, f"user{user_id}@example.com", "user", hash_password, None)
+
+
+def test_put_then_get():
+    cache = UserCache()
+    cache.put(snapshot(), cache.generation)
+    assert cache.get_by_email("USER1@example.com").id == 1
+
+
+def test_fill_started_before_invalidation_is_dropped():
+    cache = UserCache()
+    generation = cache.generation
+    cache.invalidate(user_id=1)
+    cache.put(snapshot(hash_password="stale"), generation)
+    assert cache.get_by_id(1) is None
+    assert cache.stale_fills == 1
@@ -0,0 +1,55 @@
+import asyncio
+import sqlite3
+
+from sqlalchemy import create_engine
+
+from app.bd.database import Base
+from app.bd.sharding import ShardedDatabase
+from app.bd.migrations import ensure_schema_sync
+from app.user.repositories import UserRepositories
+from app.user.services import UserServices
+
+
+def legacy_database(path: str) -> None:
+    # schema d'avant la migration 2: created_date nullable, quelques lignes sans date
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE users (id INTEGER NOT NULL PRIMARY KEY, email VARCHAR NOT NULL, name VARCHAR NOT NULL, "
+        "hash_password VARCHAR NOT NULL, role VARCHAR DEFAULT 'customer' NOT NULL, created_date DATETIME)"
+    )
+    conn.execute("CREATE UNIQUE INDEX ix_users_email ON users (email)")
+    conn.execute("CREATE INDEX ix_users_created_date ON users (created_date)")
+    conn.executemany(
+        "INSERT INTO users (id, email, name, hash_password, created_date) VALUES (?, ?, ?, 'x', ?)",
+        [
+            (1, "a@example.com", "a", "2024-01-01 00:00:00.000000"),
+            (2, "b@example.com", "b", None),
+            (3, "c@example.com", "c", "2024-01-02 00:00:00.000000"),
+            (4, "d@example.com", "d", None),
+        ]
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_pages_cover_rows_that_had_no_created_date(tmp_path):
+    path = tmp_path / "users.db"
+    legacy_database(str(path))
+    sync_engine = create_engine(f"sqlite:///{path}")
+    ensure_schema_sync(sync_engine, Base.metadata)
+    sync_engine.dispose()
+
+    async def scenario():
+        database = ShardedDatabase(f"sqlite+aiosqlite:///{path}")
+        services = UserServices(UserRepositories(database.read_session, database))
+        seen, cursor = [], None
+        while True:
+            page = await services.list_users(1, cursor)
+            seen.extend(user.id for user in page.items)
+            if page.next_cursor is None:
+                break
+            cursor = page.next_cursor
+        await database.dispose()
+        return seen
+
+    assert asyncio.run(scenario()) == [2, 4, 1, 3]